@@ -13,12 +13,17 @@ Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
 import datetime
 import json
-from typing import List, Dict
+import os
+from typing import List, Dict, Iterable, Optional
 from call import Call
-from visualizer import Visualizer
+from callstore import CallStore
+from executor import FilterExecutor, EXECUTOR_MODES, SERIAL
 from customer import Customer
 from phoneline import PhoneLine
 from contract import TermContract, MTMContract, PrepaidContract
+from registry import LineRegistry, get_registry
+from eventstream import iter_events, load_customers, parse_time
+from snapshot import load_snapshot, save_snapshot
 
 
 def import_data() -> Dict[str, List[Dict]]:
@@ -34,6 +39,17 @@ def import_data() -> Dict[str, List[Dict]]:
     return log
 
 
+def import_customers(filename: str = "dataset.json") \
+        -> Dict[str, List[Dict]]:
+    """ Return a dictionary containing only the customers from the dataset
+    <filename>, in the same format as import_data. The events are skipped
+    without being kept in memory; use stream_event_history to process them.
+
+    Precondition: the dataset file must be in the json format.
+    """
+    return {'customers': load_customers(filename)}
+
+
 def create_customers(log: Dict[str, List[Dict]]) -> List[Customer]:
     """ Returns a list of Customer instances for each customer from the input
     dataset from the dictionary <log>.
@@ -41,8 +57,14 @@ def create_customers(log: Dict[str, List[Dict]]) -> List[Customer]:
     Precondition:
     - The <log> dictionary contains the input data in the correct format,
     matching the expected input format described in the handout.
+
+    All the customers are attached to a single LineRegistry, which indexes
+    their phone numbers for process_event_history, and the calls of all their
+    phone lines are kept in a single CallStore.
     """
     customer_list = []
+    registry = LineRegistry()
+    store = CallStore()
     for cust in log['customers']:
         customer = Customer(cust['id'])
         for line in cust['lines']:
@@ -57,8 +79,9 @@ def create_customers(log: Dict[str, List[Dict]]) -> List[Customer]:
                                         datetime.date(2019, 6, 25))
             else:
                 print("ERROR: unknown contract type")
-            line = PhoneLine(line['number'], contract)
+            line = PhoneLine(line['number'], contract, store)
             customer.add_phone_line(line)
+        customer.set_registry(registry)
         customer_list.append(customer)
     return customer_list
 
@@ -69,11 +92,18 @@ def find_customer_by_number(number: str, customer_list: List[Customer]) \
     customers <customer_list>.
     If the number does not belong to any customer, return None.
     """
-    cust = None
-    for customer in customer_list:
-        if number in customer:
-            cust = customer
-    return cust
+    if customer_list:
+        registry = customer_list[0].get_registry()
+        if registry is not None and registry.covers(customer_list):
+            return registry.find_customer(number)
+    # Lists which are not covered by one registry, e.g. sublists, are
+    # scanned rather than indexed for a single lookup. Like the registry,
+    # the scan gives the number to the last customer owning it.
+    owner = None
+    for cust in customer_list:
+        if number in cust:
+            owner = cust
+    return owner
 
 
 def new_month(customer_list: List[Customer], month: int, year: int) -> None:
@@ -85,7 +115,8 @@ def new_month(customer_list: List[Customer], month: int, year: int) -> None:
 
 
 def process_event_history(log: Dict[str, List[Dict]],
-                          customer_list: List[Customer]) -> None:
+                          customer_list: List[Customer],
+                          batch_billing: bool = False) -> None:
     """ Process the calls from the <log> dictionary. The <customer_list>
     list contains all the customers that exist in the <log> dictionary.
 
@@ -104,44 +135,129 @@ def process_event_history(log: Dict[str, List[Dict]],
     - The <log> dictionary is in the correct format, as defined in the
     handout.
     - The <customer_list> already contains all the customers from the <log>.
+
+    If <batch_billing> is True, the calls are billed a month at a time
+    instead of one by one (see process_events).
     """
-    billing_date = datetime.datetime.strptime(log['events'][0]['time'],
-                                              "%Y-%m-%d %H:%M:%S")
-    billing_month = billing_date.month
-    new_month(customer_list, billing_date.month, billing_date.year)
-    for event_data in log['events']:
-        event_date = datetime.datetime.strptime(event_data['time'],
-                                                "%Y-%m-%d %H:%M:%S")
-        if event_date.month != billing_month:
-            billing_date = event_date
-            billing_month = event_date.month
-            new_month(customer_list, billing_date.month, billing_date.year)
+    process_events(log['events'], customer_list, batch_billing)
+
+
+def stream_event_history(filename: str,
+                         customer_list: List[Customer],
+                         batch_billing: bool = False) -> None:
+    """ Process the calls from the dataset <filename> one event at a time,
+    without loading the whole dataset into memory. The <customer_list> list
+    contains all the customers that exist in the dataset, e.g. as created from
+    import_customers.
+
+    <filename> is either a regular JSON dataset, or an NDJSON file (ending in
+    ".ndjson") with one event per line.
+
+    The preconditions and <batch_billing> are the same as for
+    process_event_history.
+    """
+    process_events(iter_events(filename), customer_list, batch_billing)
+
+
+def process_events(events: Iterable[Dict],
+                   customer_list: List[Customer],
+                   batch_billing: bool = False,
+                   last_time: Optional[str] = None) -> None:
+    """ Process the calls from <events>, an iterable of event dictionaries
+    in the format of the input dataset, ordered chronologically. The
+    <customer_list> list contains all the customers that exist in <events>.
+
+    All customers are advanced to a new month everytime a new month is
+    detected for the current event.
+
+    If <batch_billing> is True, the outgoing calls are only registered, and
+    each month is billed at once with batchbilling.bill_month before the
+    customers are advanced to the next month, and after the last event. The
+    bills are the same; this needs NumPy.
+
+    <last_time> is the time of the last event processed before <events>, if
+    any: the customers are not advanced again to the month of <last_time>.
+    It cannot be combined with <batch_billing>.
+
+    Raise a ValueError, without processing any event, if both <batch_billing>
+    and <last_time> are given.
+    """
+    if batch_billing and last_time is not None:
+        raise ValueError("Batch billing cannot resume after an earlier event")
+    registry = get_registry(customer_list)
+    if batch_billing:
+        # NumPy is only imported when batch billing is used
+        from batchbilling import bill_month
+    # The month is detected from the month digits of the timestamp, so that
+    # only call events need their timestamp parsed.
+    billing_month = last_time[5:7] if last_time is not None else None
+    current_month = None
+    for event_data in events:
+        event_time = event_data['time']
+        event_date = None
+        if event_time[5:7] != billing_month:
+            event_date = parse_time(event_time)
+            billing_month = event_time[5:7]
+            if batch_billing and current_month is not None:
+                bill_month(customer_list, *current_month)
+            current_month = (event_date.month, event_date.year)
+            new_month(customer_list, event_date.month, event_date.year)
         if event_data['type'] == 'call':
+            if event_date is None:
+                event_date = parse_time(event_time)
             current_call = Call(event_data['src_number'],
                                 event_data['dst_number'],
-                                datetime.datetime.strptime(event_data['time'],
-                                                           "%Y-%m-%d %H:%M:%S"),
-                                event_data['duration'], tuple(event_data['src_loc']),
+                                event_date,
+                                event_data['duration'],
+                                tuple(event_data['src_loc']),
                                 tuple(event_data['dst_loc']))
-            src_number = find_customer_by_number(event_data['src_number'],
-                                                 customer_list)
-            if src_number is not None:
-                src_number.make_call(current_call)
-            dst_number = find_customer_by_number(event_data['dst_number'],
-                                                 customer_list)
-            if dst_number is not None:
-                dst_number.receive_call(current_call)
+            src_line = registry.find(event_data['src_number'])
+            if src_line is not None:
+                if batch_billing:
+                    src_line[1].get_call_history().register_outgoing_call(
+                        current_call)
+                else:
+                    src_line[1].make_call(current_call)
+            dst_line = registry.find(event_data['dst_number'])
+            if dst_line is not None:
+                dst_line[1].receive_call(current_call)
+    if batch_billing and current_month is not None:
+        bill_month(customer_list, *current_month)
 
 
 if __name__ == '__main__':
-    v = Visualizer()
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="MewbileTech phone management system")
+    parser.add_argument('--executor', choices=EXECUTOR_MODES, default=SERIAL,
+                        help="how filters are applied to the calls")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of threads or processes for filters")
+    parser.add_argument('--snapshot', metavar='FILE',
+                        help="load the processed dataset from this snapshot, "
+                             "or save it there if it is missing or stale")
+    args = parser.parse_args()
+
+    # The user interface is only imported when the application is run, so
+    # that the functions above can be used without pygame and tkinter
+    from visualizer import Visualizer
+    v = Visualizer(FilterExecutor(args.executor, args.workers))
     print("Toronto map coordinates:")
     print("  Lower-left corner: -79.697878, 43.576959")
     print("  Upper-right corner: -79.196382, 43.799568")
 
-    input_dictionary = import_data()
-    customers = create_customers(input_dictionary)
-    process_event_history(input_dictionary, customers)
+    customers = None
+    if args.snapshot and os.path.exists(args.snapshot):
+        try:
+            customers = load_snapshot(args.snapshot, "dataset.json")
+        except ValueError as error:
+            print("Ignoring the snapshot:", error)
+    if customers is None:
+        input_dictionary = import_data()
+        customers = create_customers(input_dictionary)
+        process_event_history(input_dictionary, customers)
+        if args.snapshot:
+            save_snapshot(args.snapshot, customers, "dataset.json")
 
     # ----------------------------------------------------------------------
     # NOTE: You do not need to understand any of the implementation below,
@@ -152,10 +268,7 @@ if __name__ == '__main__':
     # Gather all calls to be drawn on screen for filtering, but we only want
     # to plot each call only once, so only plot the outgoing calls to screen.
     # (Each call is registered as both an incoming and outgoing)
-    all_calls = []
-    for c in customers:
-        hist = c.get_history()
-        all_calls.extend(hist[0])
+    all_calls = get_registry(customers).get_all_calls()
     print("\n-----------------------------------------")
     print("Total Calls in the dataset:", len(all_calls))
 
@@ -178,15 +291,19 @@ if __name__ == '__main__':
         # Put the connections on top of the other sprites
         drawables.extend(connections)
         v.render_drawables(drawables)
+    v.executor.close()
 
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'json', 'datetime',
-            'visualizer', 'customer', 'call', 'contract', 'phoneline'
+            'python_ta', 'typing', 'json', 'datetime', 'os',
+            'visualizer', 'customer', 'call', 'callstore', 'contract',
+            'phoneline', 'registry', 'eventstream', 'executor', 'argparse',
+            'batchbilling', 'snapshot'
         ],
         'allowed-io': [
             'create_customers', 'import_data'
         ],
+        'disable': ['C0415'],
         'generated-members': 'pygame.*'
     })
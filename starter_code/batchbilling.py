@@ -0,0 +1,99 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+from array import array
+from math import ceil
+from typing import List
+import numpy as np
+from customer import Customer
+from phoneline import PhoneLine
+from callstore import take_column
+
+"""
+=== Module Description ===
+
+This file contains the batch billing of a whole month. Instead of billing
+every call as it is made (PhoneLine.make_call), the outgoing calls of a month
+are registered without being billed, and the month is billed at once when it
+is over: the billed minutes of every phone line are summed with NumPy over the
+durations kept in the CallStore, and each line's contract bills its total in
+one step (Contract.bill_minutes).
+
+The bills are the same as the ones built call by call: the fixed costs and
+rates are set by the same new_month calls, each call is still rounded up to
+the next minute, and the free minutes of term contracts are capped at
+TERM_MINS in the same way.
+"""
+
+
+def month_minutes(lines: List[PhoneLine], month: int, year: int) \
+        -> List[int]:
+    """ Return the number of minutes of outgoing calls of each phone line in
+    <lines> for <month> and <year>, every call rounded up to the next minute.
+    """
+    histories = [line.get_call_history() for line in lines]
+    store = histories[0].get_store() if histories else None
+    rows = array('q')
+    offsets = [0]
+    for history in histories:
+        if history.get_store() is store:
+            rows.extend(history.get_outgoing_rows(month, year))
+        offsets.append(len(rows))
+
+    durations = take_column(store.durations, np.frombuffer(rows, np.int64)) \
+        if rows else np.zeros(0, dtype=np.int64)
+    # ceil(duration / 60) for every call, as in Contract.bill_call
+    minutes = (durations + 59) // 60
+    cumulative = np.zeros(len(minutes) + 1, dtype=np.int64)
+    np.cumsum(minutes, out=cumulative[1:])
+    bounds = np.array(offsets, dtype=np.int64)
+    totals = (cumulative[bounds[1:]] - cumulative[bounds[:-1]]).tolist()
+
+    # Call histories kept in another CallStore are summed one call at a time
+    for i, history in enumerate(histories):
+        if history.get_store() is not store:
+            totals[i] = sum(ceil(call.duration / 60.0) for call in
+                            history.iter_monthly_history(month, year)[0])
+    return totals
+
+
+def bill_month(customer_list: List[Customer], month: int, year: int) -> None:
+    """ Bill the outgoing calls made in <month> and <year> by the phone lines
+    of the customers in <customer_list>, which were registered into the call
+    histories without being billed.
+
+    A bill is created for the lines that do not have one for this month yet,
+    like PhoneLine.make_call does.
+
+    Precondition:
+    - the bill for <month> and <year> of every line with calls in that month
+    is the current bill of its contract, or has not been created yet
+    - none of these calls was billed already
+    """
+    lines = [line for cust in customer_list for line in cust.get_phone_lines()]
+    for line, minutes in zip(lines, month_minutes(lines, month, year)):
+        if minutes > 0 or \
+                line.get_call_history().get_outgoing_rows(month, year):
+            line.new_month(month, year)
+            line.contract.bill_minutes(minutes)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'array', 'math', 'numpy', 'customer',
+            'phoneline', 'callstore'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,694 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import argparse
+import datetime
+import json
+import os
+import pickle
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from eventstream import TIME_FORMAT, parse_time
+from call import Call
+from customer import Customer
+from callstore import CallStore, get_store
+from callindex import CallList, GridIndex, DurationIndex, clear_index_cache
+from filter import DurationFilter, CustomerFilter, LocationFilter, \
+    ResetFilter, _helper4, _helper5
+from application import create_customers, process_event_history
+from datagen import DatasetGenerator, GeneratorConfig
+from billing import generate_bills
+from sharding import process_events_sharded
+
+"""
+=== Module Description ===
+
+This file contains timing benchmarks for the data loading, billing, filtering
+and rendering code.
+
+The benchmark suite times each stage on synthetic datasets of increasing size,
+and writes the results as JSON, so that runs from different versions can be
+compared:
+
+    python benchmark.py --sizes 1000,100000,1000000 --output new.json
+    python benchmark.py --output new.json --compare old.json
+
+The comparison reports every timing that got slower by more than the
+tolerance, and exits with status 1 if there is any.
+
+The micro-benchmarks comparing the fast paths against the original code are
+run with:
+
+    python benchmark.py --micro
+
+and the vectorized filters are compared with Filter.apply on 10M calls with:
+
+    python benchmark.py --vector 10000000
+"""
+
+# Default dataset sizes for the suite, in number of events
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# Relative slowdown above which a timing is reported as a regression
+DEFAULT_TOLERANCE = 0.2
+
+# Maximum number of calls drawn in the rendering benchmark
+MAX_RENDERED_CALLS = 20000
+
+
+def _make_timestamps(n: int) -> List[str]:
+    """ Return <n> event timestamps in the dataset format, one minute apart.
+    """
+    start = datetime.datetime(2018, 1, 1)
+    step = datetime.timedelta(minutes=1)
+    return [(start + i * step).strftime(TIME_FORMAT) for i in range(n)]
+
+
+def _best_time(fun: Callable[[], None], repeat: int = 3) -> float:
+    """ Return the fastest of <repeat> runs of <fun>, in seconds.
+    """
+    best = None
+    for _ in range(repeat):
+        t1 = time.perf_counter()
+        fun()
+        elapsed = time.perf_counter() - t1
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_parse_time(n: int = 200000) -> float:
+    """ Compare parsing <n> call timestamps the way process_event_history
+    originally did (strptime twice per call) with a single parse_time.
+    Print both timings and return the speedup.
+    """
+    timestamps = _make_timestamps(n)
+
+    def strptime_twice() -> None:
+        """ Parse each timestamp twice with strptime """
+        for text in timestamps:
+            datetime.datetime.strptime(text, TIME_FORMAT)
+            datetime.datetime.strptime(text, TIME_FORMAT)
+
+    def fast_path() -> None:
+        """ Parse each timestamp once with parse_time """
+        for text in timestamps:
+            parse_time(text)
+
+    old = _best_time(strptime_twice)
+    new = _best_time(fast_path)
+    print("parse_time ({} timestamps)".format(n))
+    print("  strptime x2: {0:.4f}s".format(old))
+    print("  parse_time:  {0:.4f}s".format(new))
+    print("  speedup:     {0:.1f}x".format(old / new))
+    return old / new
+
+
+def _make_calls(n: int, seed: int = 148) -> List[Call]:
+    """ Return <n> random calls inside the Toronto map boundaries.
+    """
+    rng = random.Random(seed)
+    start = datetime.datetime(2018, 1, 1)
+    calls = []
+    for i in range(n):
+        calls.append(Call('{0:03d}-{1:04d}'.format(i % 1000, i % 10000),
+                          '{0:03d}-{1:04d}'.format(i % 997, i % 9973),
+                          start + datetime.timedelta(minutes=i),
+                          rng.randint(0, 3600),
+                          (rng.uniform(-79.697878, -79.196382),
+                           rng.uniform(43.576959, 43.799568)),
+                          (rng.uniform(-79.697878, -79.196382),
+                           rng.uniform(43.576959, 43.799568))))
+    return calls
+
+
+def bench_location_index(n: int = 200000, queries: int = 20) -> float:
+    """ Compare <queries> rectangle queries over <n> calls, scanning every
+    call versus querying a GridIndex. The time to build the index once is
+    reported separately. Print the timings and return the per-query speedup.
+    """
+    calls = _make_calls(n)
+    rng = random.Random(1)
+    rectangles = []
+    for _ in range(queries):
+        long = rng.uniform(-79.697878, -79.25)
+        lat = rng.uniform(43.576959, 43.75)
+        rectangles.append([long, lat, long + 0.05, lat + 0.03])
+    index = None
+
+    def scan() -> None:
+        """ Answer every query by scanning """
+        for rect in rectangles:
+            _helper5(calls, rect, [])
+
+    def build() -> None:
+        """ Build the index """
+        nonlocal index
+        index = GridIndex(calls)
+
+    def indexed() -> None:
+        """ Answer every query through the index """
+        for rect in rectangles:
+            index.query(*rect)
+
+    old = _best_time(scan) / queries
+    build_time = _best_time(build)
+    new = _best_time(indexed) / queries
+    print("LocationFilter ({} calls)".format(n))
+    print("  scan, per query:       {0:.5f}s".format(old))
+    print("  grid index, build:     {0:.5f}s".format(build_time))
+    print("  grid index, per query: {0:.5f}s".format(new))
+    print("  speedup per query:     {0:.1f}x".format(old / new))
+    return old / new
+
+
+def bench_duration_index(n: int = 200000) -> float:
+    """ Compare duration thresholds over <n> calls, scanning every call
+    versus querying a DurationIndex. The time to build the index once is
+    reported separately, and so is a chain of thresholds, each applied to the
+    result of the previous one. Print the timings and return the per-query
+    speedup.
+    """
+    calls = _make_calls(n)
+    thresholds = [('L', 30), ('L', 120), ('G', 3000), ('G', 3500)]
+    index = None
+
+    def scan() -> None:
+        """ Answer every query by scanning """
+        for letter, duration in thresholds:
+            _helper4(letter, calls, [], duration)
+
+    def build() -> None:
+        """ Build the index """
+        nonlocal index
+        index = DurationIndex(calls)
+
+    def indexed() -> None:
+        """ Answer every query through the index """
+        for letter, duration in thresholds:
+            if letter == 'L':
+                index.shorter_than(duration)
+            else:
+                index.longer_than(duration)
+
+    def scan_chain() -> None:
+        """ Apply each threshold to the previous result by scanning """
+        data = calls
+        for filter_string in chain:
+            new_data = []
+            _helper4(filter_string, data, new_data, int(filter_string[1:]))
+            data = new_data
+
+    def filter_chain() -> None:
+        """ Apply each threshold to the previous result with a filter """
+        data = call_list
+        for filter_string in chain:
+            data = DurationFilter().apply([], data, filter_string)
+
+    old = _best_time(scan) / len(thresholds)
+    build_time = _best_time(build)
+    new = _best_time(indexed) / len(thresholds)
+    chain = ['G30', 'L3500', 'G60', 'L3000', 'G120']
+    call_list = CallList(calls)
+    filter_chain()
+    print("DurationFilter ({} calls)".format(n))
+    print("  scan, per query:           {0:.5f}s".format(old))
+    print("  duration index, build:     {0:.5f}s".format(build_time))
+    print("  duration index, per query: {0:.5f}s".format(new))
+    print("  speedup per query:         {0:.1f}x".format(old / new))
+    print("  chain of 5, scan:          {0:.5f}s".format(
+        _best_time(scan_chain)))
+    print("  chain of 5, filter:        {0:.5f}s".format(
+        _best_time(filter_chain)))
+    return old / new
+
+
+def bench_call_memory(n: int = 100000) -> float:
+    """ Print and return the memory retained per Call, in bytes, when <n>
+    calls are built from events the way process_event_history builds them
+    (including the parsed timestamps, location tuples and phone numbers).
+    """
+    rng = random.Random(1)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    events = [('{0:03d}-{1:04d}'.format(i % 100, i % 10),
+               '{0:03d}-{1:04d}'.format(i % 97, i % 10),
+               '2018-01-01 10:00:{0:02d}'.format(i % 60), i % 600,
+               [rng.random(), rng.random()], [rng.random(), rng.random()])
+              for i in range(n)]
+    calls = [Call(src, dst, parse_time(t), duration, tuple(src_loc),
+                  tuple(dst_loc))
+             for src, dst, t, duration, src_loc, dst_loc in events]
+    del events
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    per_call = (after - before) / len(calls)
+    print("Call memory ({} calls)".format(n))
+    print("  bytes per call: {0:.0f}".format(per_call))
+    return per_call
+
+
+def bench_store_memory(n: int = 100000) -> float:
+    """ Print and return the memory retained per call, in bytes, when <n>
+    calls are built the same way as in bench_call_memory but only kept as
+    rows of a CallStore, as in a store loaded from a snapshot.
+    """
+    rng = random.Random(1)
+    store = CallStore()
+    for i in range(n):
+        store.add(Call('{0:03d}-{1:04d}'.format(i % 100, i % 10),
+                       '{0:03d}-{1:04d}'.format(i % 97, i % 10),
+                       parse_time('2018-01-01 10:00:{0:02d}'.format(i % 60)),
+                       i % 600, (rng.random(), rng.random()),
+                       (rng.random(), rng.random())))
+    # The store keeps the Call objects it was given, but not when pickled
+    pickled = pickle.dumps(store)
+    del store
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = pickle.loads(pickled)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    per_call = (after - before) / len(store)
+    print("CallStore memory ({} calls)".format(n))
+    print("  bytes per call: {0:.0f}".format(per_call))
+    return per_call
+
+
+def _make_customer_calls(n: int, seed: int = 148) \
+        -> Tuple[List[Customer], List[Call]]:
+    """ Return 200 customers with 5 phone lines each, and <n> random calls
+    between their lines, registered in the call histories of the lines.
+    """
+    log = {'customers': [
+        {'id': 1000 + i, 'lines': [
+            {'number': '{0:03d}-{1:04d}'.format(i, j), 'contract': 'mtm'}
+            for j in range(5)]}
+        for i in range(200)]}
+    customers = create_customers(log)
+    lines = [line for cust in customers for line in cust.get_phone_lines()]
+    rng = random.Random(seed)
+    start = datetime.datetime(2018, 1, 1)
+    calls = []
+    for i in range(n):
+        src = lines[rng.randrange(len(lines))]
+        dst = lines[rng.randrange(len(lines))]
+        call = Call(src.number, dst.number,
+                    start + datetime.timedelta(seconds=i),
+                    rng.randint(0, 3600),
+                    (rng.uniform(-79.697878, -79.196382),
+                     rng.uniform(43.576959, 43.799568)),
+                    (rng.uniform(-79.697878, -79.196382),
+                     rng.uniform(43.576959, 43.799568)))
+        src.callhistory.register_outgoing_call(call)
+        dst.callhistory.register_incoming_call(call)
+        calls.append(call)
+    return customers, calls
+
+
+def bench_vector_filters(n: int = 10000000) -> float:
+    """ Compare the customer, duration and location filters over <n> calls,
+    applied with Filter.apply versus evaluated as NumPy masks. Every filter
+    application starts from a new call set, so the filter indexes are
+    rebuilt each time; the NumPy columns are built once, and reported
+    separately. Print the timings and return the speedup for the chain of
+    the three filters, column building included.
+
+    The peak memory use is about 1 KB per call, index builds included.
+    """
+    # NumPy is only needed by this benchmark
+    from vectorfilter import apply_filters, get_columns
+    customers, calls = _make_customer_calls(n)
+    chain = [(CustomerFilter(), str(customers[7].get_id())),
+             (DurationFilter(), 'G600'),
+             (LocationFilter(), '-79.6, 43.6, -79.3, 43.7')]
+
+    def build() -> None:
+        """ Build the columns """
+        clear_index_cache()
+        get_columns(calls, get_store(customers))
+
+    def apply_chain() -> None:
+        """ Apply the chain of filters one after the other """
+        data = calls
+        for f, filter_string in chain:
+            clear_index_cache()
+            data = f.apply(customers, data, filter_string)
+
+    def vector_chain() -> None:
+        """ Evaluate the chain of filters as one mask """
+        clear_index_cache()
+        apply_filters(customers, calls, chain)
+
+    print("Vectorized filters ({} calls)".format(n))
+    build_time = _best_time(build, 1)
+    print("  columns, build:        {0:.4f}s".format(build_time))
+    for f, filter_string in chain:
+        old = _best_time(lambda: (clear_index_cache(),
+                                  f.apply(customers, calls, filter_string)), 1)
+        get_columns(calls, get_store(customers))
+        new = _best_time(lambda: apply_filters(customers, calls,
+                                               [(f, filter_string)]), 1)
+        print("  {0:15s} apply: {1:.4f}s  mask: {2:.4f}s  ({3:.1f}x)".format(
+            type(f).__name__, old, new, old / new))
+    old = _best_time(apply_chain, 1)
+    new = _best_time(vector_chain, 1)
+    print("  chain of 3, apply:     {0:.4f}s".format(old))
+    print("  chain of 3, mask:      {0:.4f}s (columns included)".format(new))
+    print("  speedup:               {0:.1f}x".format(old / new))
+    return old / new
+
+
+def bench_batch_billing(n: int = 300000) -> float:
+    """ Compare processing <n> events while billing every call as it is
+    made, versus billing each month at once. The time spent in the monthly
+    batch billing itself is reported separately. Print the timings and return
+    the speedup of the billing step.
+    """
+    # NumPy is only needed by the batch billing
+    import batchbilling
+    log = make_dataset(n)
+    bill_month = batchbilling.bill_month
+    batch_time = 0.0
+
+    def timed_bill_month(customer_list: List[Customer], month: int,
+                         year: int) -> None:
+        """ Run the batch billing of a month, and time it """
+        nonlocal batch_time
+        t1 = time.perf_counter()
+        bill_month(customer_list, month, year)
+        batch_time += time.perf_counter() - t1
+
+    customers = create_customers(log)
+    incremental = _timed(lambda: process_event_history(log, customers))
+    # Time the billing done call by call, month by month, on the contracts of
+    # fresh customers, so that no call is billed twice
+    months = sorted({call.get_bill_date()[::-1] for cust in customers
+                     for line in cust.get_phone_lines()
+                     for call in line.get_monthly_history()[0]})
+    fresh = create_customers(log)
+    per_call = 0.0
+    for year, month in months:
+        for cust in fresh:
+            cust.new_month(month, year)
+        calls = [(new_line.contract, call)
+                 for cust, new_cust in zip(customers, fresh)
+                 for line, new_line in zip(cust.get_phone_lines(),
+                                           new_cust.get_phone_lines())
+                 for call in line.get_monthly_history(month, year)[0]]
+        t1 = time.perf_counter()
+        for contract, call in calls:
+            contract.bill_call(call)
+        per_call += time.perf_counter() - t1
+
+    batchbilling.bill_month = timed_bill_month
+    try:
+        customers = create_customers(log)
+        batch = _timed(lambda: process_event_history(log, customers, True))
+    finally:
+        batchbilling.bill_month = bill_month
+    print("Batch billing ({} events)".format(n))
+    print("  events, billed per call:  {0:.4f}s".format(incremental))
+    print("  events, billed per month: {0:.4f}s".format(batch))
+    print("  billing, per call:        {0:.4f}s".format(per_call))
+    print("  billing, per month:       {0:.4f}s".format(batch_time))
+    print("  billing speedup:          {0:.1f}x".format(per_call / batch_time))
+    return per_call / batch_time
+
+
+def bench_parallel_billing(n: int = 300000,
+                           max_workers: Optional[int] = None) \
+        -> Dict[int, float]:
+    """ Time the month-end billing of every customer of a dataset with <n>
+    events, for each month of the dataset, with 1 to <max_workers> worker
+    processes (default: the number of CPUs). Print the throughput for each
+    number of workers, and return it in customer bills per second.
+    """
+    log = make_dataset(n)
+    customers = create_customers(log)
+    process_event_history(log, customers)
+    months = sorted({(int(event['time'][5:7]), int(event['time'][:4]))
+                     for event in log['events']})
+    throughput = {}
+    print("Parallel billing ({} customers, {} months, {} CPUs)".format(
+        len(customers), len(months), os.cpu_count()))
+    for workers in range(1, (max_workers or os.cpu_count() or 1) + 1):
+        elapsed = _best_time(lambda: [generate_bills(customers, month, year,
+                                                     workers)
+                                      for month, year in months])
+        throughput[workers] = len(customers) * len(months) / elapsed
+        print("  {0} worker(s): {1:.4f}s, {2:.0f} bills/s ({3:.2f}x)".format(
+            workers, elapsed, throughput[workers],
+            throughput[workers] / throughput[1]))
+    return throughput
+
+
+def bench_sharded_ingestion(n: int = 300000,
+                            max_shards: Optional[int] = None) \
+        -> Dict[int, float]:
+    """ Time processing a dataset with <n> events sequentially, and in 2 to
+    <max_shards> shards (default: the number of CPUs). Print the timings for
+    each number of shards, and return them in seconds.
+    """
+    log = make_dataset(n)
+    timings = {}
+    print("Sharded ingestion ({} events, {} CPUs)".format(n, os.cpu_count()))
+    for shards in range(1, (max_shards or os.cpu_count() or 1) + 1):
+        customers = create_customers(log)
+        timings[shards] = _timed(
+            lambda: process_events_sharded(log['events'], customers, shards))
+        print("  {0} shard(s): {1:.4f}s ({2:.2f}x)".format(
+            shards, timings[shards], timings[1] / timings[shards]))
+    return timings
+
+
+def make_dataset(n_events: int, seed: int = 148) -> Dict[str, List[Dict]]:
+    """ Return a synthetic dataset with <n_events> events spread over three
+    months, in the format of the input dataset.
+    """
+    config = GeneratorConfig(customers=max(5, n_events // 200), max_lines=3,
+                             events=n_events, seed=seed)
+    return DatasetGenerator(config).dataset()
+
+
+def _timed(fun: Callable[[], Any]) -> float:
+    """ Return the time taken by one run of <fun>, in seconds.
+    """
+    t1 = time.perf_counter()
+    fun()
+    return time.perf_counter() - t1
+
+
+def bench_suite_size(log: Dict[str, List[Dict]], repeat: int = 3,
+                     render: bool = True) -> Dict[str, float]:
+    """ Time every stage of loading, billing, filtering and rendering the
+    dataset <log>, and return the best time of <repeat> runs of each stage,
+    keyed by stage name.
+    """
+    best = {}
+
+    def record(name: str, elapsed: float) -> None:
+        """ Keep the fastest time for <name> """
+        if name not in best or elapsed < best[name]:
+            best[name] = elapsed
+
+    filters = [('filter.duration', DurationFilter(), 'G1800'),
+               ('filter.location', LocationFilter(),
+                '-79.6, 43.6, -79.4, 43.7'),
+               ('filter.customer', CustomerFilter(), '1000'),
+               ('filter.reset', ResetFilter(), '')]
+    customers = []
+    calls = []
+    for _ in range(repeat):
+        clear_index_cache()
+        customers = []
+        record('create_customers', _timed(
+            lambda: customers.extend(create_customers(log))))
+        record('process_event_history', _timed(
+            lambda: process_event_history(log, customers)))
+        calls = ResetFilter().apply(customers, [], '')
+        for name, f, filter_string in filters:
+            record(name, _timed(
+                lambda: f.apply(customers, calls, filter_string)))
+        record('generate_bill', _timed(
+            lambda: [c.generate_bill(month, 2018) for c in customers
+                     for month in (1, 2, 3)]))
+    if render:
+        render_time = bench_render(calls[:MAX_RENDERED_CALLS], repeat)
+        if render_time is not None:
+            best['render_objects'] = render_time
+    return best
+
+
+def bench_render(calls: List[Call], repeat: int = 3) -> Optional[float]:
+    """ Return the best time of <repeat> renders of the sprites and
+    connections of <calls> onto an off-screen surface, or None if pygame is
+    not available.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    try:
+        import pygame
+        from visualizer import Map, SCREEN_SIZE
+    except ImportError:
+        return None
+    map_view = Map(SCREEN_SIZE)
+    screen = pygame.Surface(SCREEN_SIZE)
+    drawables = []
+    for call in calls:
+        drawables.extend(call.get_drawables())
+    drawables.extend(call.get_connection() for call in calls)
+    return _best_time(lambda: map_view.render_objects(drawables, screen),
+                      repeat)
+
+
+def run_suite(sizes: List[int], repeat: int = 3,
+              render: bool = True) -> Dict[str, Any]:
+    """ Run the benchmark suite on synthetic datasets with each number of
+    events in <sizes>, and return the results as a JSON-compatible
+    dictionary.
+    """
+    results = []
+    for n_events in sizes:
+        log = make_dataset(n_events)
+        timings = bench_suite_size(log, repeat, render)
+        for name in timings:
+            results.append({'benchmark': name, 'events': n_events,
+                            'seconds': timings[name]})
+            print("{0:>10} events  {1:<24}{2:.5f}s".format(
+                n_events, name, timings[name]), file=sys.stderr)
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'repeat': repeat,
+            'results': results}
+
+
+def compare_results(old: Dict[str, Any], new: Dict[str, Any],
+                    tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """ Return a description of every benchmark in <new> that is slower than
+    the same benchmark and size in <old> by more than <tolerance>.
+    """
+    old_times = {(r['benchmark'], r['events']): r['seconds']
+                 for r in old['results']}
+    regressions = []
+    for r in new['results']:
+        before = old_times.get((r['benchmark'], r['events']))
+        if before is not None and r['seconds'] > before * (1 + tolerance):
+            regressions.append("{} ({} events): {:.5f}s -> {:.5f}s".format(
+                r['benchmark'], r['events'], before, r['seconds']))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """ Run the benchmarks from the command line arguments <argv>, and
+    return the exit status.
+    """
+    parser = argparse.ArgumentParser(
+        description="Time the loading, billing, filtering and rendering of "
+                    "synthetic datasets, and compare the results with an "
+                    "earlier run")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated dataset sizes, in events")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="runs per benchmark; the fastest is kept")
+    parser.add_argument('--output', help="JSON file for the results "
+                                         "(default: standard output)")
+    parser.add_argument('--compare', help="JSON results of an earlier run "
+                                          "to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--no-render', action='store_true',
+                        help="skip the rendering benchmark")
+    parser.add_argument('--micro', action='store_true',
+                        help="run the fast path micro-benchmarks instead")
+    parser.add_argument('--billing', type=int, metavar='WORKERS',
+                        help="time the month-end billing with 1 to WORKERS "
+                             "processes instead")
+    parser.add_argument('--shards', type=int, metavar='SHARDS',
+                        help="time the event processing in 1 to SHARDS "
+                             "shards instead")
+    parser.add_argument('--vector', type=int, metavar='CALLS',
+                        help="compare the vectorized filters on CALLS calls "
+                             "instead (e.g. 10000000)")
+    args = parser.parse_args(argv)
+    # Keep pygame's import banner out of the JSON written to standard output
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+    if args.vector:
+        bench_vector_filters(args.vector)
+        return 0
+    if args.billing:
+        bench_parallel_billing(max_workers=args.billing)
+        return 0
+    if args.shards:
+        bench_sharded_ingestion(max_shards=args.shards)
+        return 0
+    if args.micro:
+        bench_parse_time()
+        bench_location_index()
+        bench_duration_index()
+        bench_call_memory()
+        bench_store_memory()
+        bench_batch_billing()
+        return 0
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = run_suite(sizes, args.repeat, not args.no_render)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(json.load(f), results,
+                                          args.tolerance)
+        for regression in regressions:
+            print("REGRESSION:", regression, file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    status = main()
+    import python_ta
+    from contextlib import redirect_stdout
+    # The results may be written to standard output, so the report goes to
+    # standard error
+    with redirect_stdout(sys.stderr):
+        python_ta.check_all(config={
+            'allowed-import-modules': [
+                'python_ta', 'contextlib', 'typing', 'argparse', 'datetime',
+                'json', 'os', 'pickle', 'platform', 'random', 'sys', 'time',
+                'tracemalloc', 'eventstream', 'call', 'customer', 'callstore',
+                'callindex', 'filter', 'application', 'datagen', 'billing',
+                'sharding', 'batchbilling', 'vectorfilter', 'visualizer',
+                'pygame'
+            ],
+            'allowed-io': [
+                'bench_parse_time', 'bench_location_index',
+                'bench_duration_index', 'bench_call_memory',
+                'bench_store_memory', 'bench_vector_filters',
+                'bench_batch_billing', 'bench_parallel_billing',
+                'bench_sharded_ingestion', 'run_suite', 'main'
+            ],
+            'disable': ['C0415'],
+            'generated-members': 'pygame.*'
+        })
+    sys.exit(status)
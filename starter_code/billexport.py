@@ -0,0 +1,156 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import csv
+import gzip
+import json
+from typing import Dict, Iterable, Iterator, List, TextIO, Tuple, Union
+from customer import Customer
+from billing import generate_bills, CustomerBill
+
+"""
+=== Module Description ===
+
+This file contains the streaming export of the bills of every customer, for
+a range of months, to CSV or NDJSON files, optionally compressed with gzip.
+
+Every customer bill is written as one row per phone line bill, with the
+fields of PhoneLine.get_bill, followed by one row with the customer totals.
+The rows are written as the bills are generated, so the memory used does not
+grow with the number of customers or months exported.
+"""
+
+# Output formats
+CSV = 'csv'
+NDJSON = 'ndjson'
+EXPORT_FORMATS = [CSV, NDJSON]
+
+# Kinds of rows
+LINE_ROW = 'line'
+CUSTOMER_ROW = 'customer'
+
+# Columns of the CSV rows. Line rows have no "lines" count, and customer rows
+# only have the customer, month, year, total and lines.
+EXPORT_FIELDS = ['kind', 'customer', 'month', 'year', 'number', 'type',
+                 'fixed', 'free_mins', 'billed_mins', 'min_rate', 'total',
+                 'lines']
+
+# A row of the export
+BillRow = Dict[str, Union[str, int, float]]
+
+
+def iter_customer_bills(customers: List[Customer],
+                        months: Iterable[Tuple[int, int]],
+                        workers: int = 1) \
+        -> Iterator[Tuple[int, int, CustomerBill]]:
+    """ Yield the bill of every customer in <customers> for each (month, year)
+    of <months>, as (month, year, customer bill) tuples, by month and then in
+    increasing order of customer id.
+
+    With one worker, the bills are generated one at a time as they are
+    requested. With more, the bills of each month are generated at once in a
+    pool of <workers> processes, as billing.generate_bills.
+    """
+    ordered = sorted(customers, key=Customer.get_id)
+    for month, year in months:
+        if workers <= 1:
+            for cust in ordered:
+                yield month, year, cust.generate_bill(month, year)
+        else:
+            for bill in generate_bills(ordered, month, year, workers):
+                yield month, year, bill
+
+
+def iter_bill_rows(bills: Iterable[Tuple[int, int, CustomerBill]]) \
+        -> Iterator[BillRow]:
+    """ Yield the export rows of <bills>, as (month, year, customer bill)
+    tuples: a row for every phone line bill, then a row with the customer
+    totals. Customers without any phone line bill for the month have no rows.
+    """
+    for month, year, (cust_id, total, lines) in bills:
+        if not lines:
+            continue
+        for line in lines:
+            row = {'kind': LINE_ROW, 'customer': cust_id, 'month': month,
+                   'year': year}
+            row.update(line)
+            yield row
+        yield {'kind': CUSTOMER_ROW, 'customer': cust_id, 'month': month,
+               'year': year, 'total': total, 'lines': len(lines)}
+
+
+def write_bill_rows(out: TextIO, rows: Iterable[BillRow],
+                    export_format: str = CSV) -> int:
+    """ Write <rows> to <out> in <export_format>, one at a time, and return
+    the number of rows written.
+    """
+    count = 0
+    if export_format == CSV:
+        writer = csv.DictWriter(out, EXPORT_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    elif export_format == NDJSON:
+        for row in rows:
+            out.write(json.dumps(row))
+            out.write('\n')
+            count += 1
+    else:
+        raise ValueError("Unknown export format: " + export_format)
+    return count
+
+
+def open_export(filename: str, compress: bool = False) -> TextIO:
+    """ Open <filename> for writing an export, compressed with gzip if
+    <compress> is True or <filename> ends with ".gz".
+    """
+    if compress or filename.endswith('.gz'):
+        return gzip.open(filename, 'wt', newline='')
+    return open(filename, 'w', newline='')
+
+
+def export_bills(filename: str, customers: List[Customer],
+                 months: Iterable[Tuple[int, int]],
+                 export_format: str = CSV, compress: bool = False,
+                 workers: int = 1) -> int:
+    """ Write the bills of every customer in <customers> for each (month,
+    year) of <months> to the file <filename>, as the rows of iter_bill_rows
+    in <export_format>, and return the number of rows written.
+
+    The file is compressed with gzip if <compress> is True or <filename> ends
+    with ".gz". The bills are generated by <workers> processes, as in
+    iter_customer_bills.
+
+    Raise a ValueError, without creating <filename>, if <export_format> is
+    not one of EXPORT_FORMATS.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError("Unknown export format: " + export_format)
+    with open_export(filename, compress) as out:
+        return write_bill_rows(
+            out, iter_bill_rows(iter_customer_bills(customers, months,
+                                                    workers)),
+            export_format)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'csv', 'gzip', 'json', 'customer',
+            'billing'
+        ],
+        'allowed-io': ['open_export'],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,92 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import math
+import multiprocessing
+from typing import Dict, List, Optional, Tuple
+from customer import Customer
+
+"""
+=== Module Description ===
+
+This file contains the month-end billing of every customer. Once the events
+are processed, the bill of a customer only depends on its own phone lines, so
+the customers can be split into shards and billed in a pool of processes.
+
+As in the executor module, the pool is started with the "fork" method: the
+workers inherit the customers from the parent process, and only send back the
+bill summaries of their shard.
+"""
+
+# A bill summary, as returned by Customer.generate_bill
+CustomerBill = Tuple[int, float, List[Dict]]
+
+# Number of shards per worker, so that slow shards do not leave the other
+# workers idle
+SHARDS_PER_WORKER = 4
+
+# The billing shared with the forked worker processes, as
+# (customers, month, year)
+_shared_billing: Optional[Tuple[List[Customer], int, int]] = None
+
+
+def _bill_range(bounds: Tuple[int, int]) -> List[CustomerBill]:
+    """ Return the bills of the shared customers between positions <bounds>.
+    This runs in a worker process.
+    """
+    customers, month, year = _shared_billing
+    start, end = bounds
+    return [cust.generate_bill(month, year) for cust in customers[start:end]]
+
+
+def generate_bills(customers: List[Customer], month: int, year: int,
+                   workers: int = 1) -> List[CustomerBill]:
+    """ Return the bill of every customer in <customers> for <month> and
+    <year>, as returned by Customer.generate_bill, in increasing order of
+    customer id.
+
+    If <workers> is more than 1, the customers are billed in a pool of
+    <workers> processes; if the platform cannot fork processes, they are
+    billed in this process.
+    """
+    ordered = sorted(customers, key=Customer.get_id)
+    if workers <= 1 or len(ordered) < 2 or \
+            'fork' not in multiprocessing.get_all_start_methods():
+        return [cust.generate_bill(month, year) for cust in ordered]
+
+    global _shared_billing
+    shard_size = math.ceil(len(ordered) / (workers * SHARDS_PER_WORKER))
+    bounds = [(start, min(start + shard_size, len(ordered)))
+              for start in range(0, len(ordered), shard_size)]
+    _shared_billing = (ordered, month, year)
+    try:
+        context = multiprocessing.get_context('fork')
+        with context.Pool(processes=min(workers, len(bounds))) as pool:
+            results = pool.map(_bill_range, bounds)
+    finally:
+        _shared_billing = None
+    bills = []
+    for shard in results:
+        bills.extend(shard)
+    return bills
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'math', 'multiprocessing', 'customer'
+        ],
+        'disable': ['W0603'],
+        'generated-members': 'pygame.*'
+    })
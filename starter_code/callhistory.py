@@ -11,47 +11,205 @@ any changes, are expressly prohibited.
 All of the files in this directory and all subdirectories are:
 Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
-from typing import Dict, List, Tuple
+import warnings
+from array import array
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Tuple
 from call import Call
+from callstore import CallStore
+from callindex import CallList
+
+# The rows of a month without calls
+_NO_ROWS = array('q')
 
 
 class CallHistory:
     """A class for recording incoming and outgoing calls for a particular number
 
+    The calls themselves are kept in a CallStore, shared with other call
+    histories; a call history only records the rows of its calls, grouped by
+    month.
+
     === Public Attributes ===
     incoming_calls:
          Dictionary of incoming calls. Keys are tuples containing a month and a
          year, values are a List of Call objects for that month and year.
+         Deprecated: this is built again from the CallStore on every access,
+         and changes made to it are lost; use iter_monthly_history instead.
     outgoing_calls:
          Dictionary of outgoing calls. Keys are tuples containing a month and a
          year, values are a List of Call objects for that month and year.
+         Deprecated: this is built again from the CallStore on every access,
+         and changes made to it are lost; use iter_monthly_history instead.
     """
+    # === Private Attributes ===
+    # _store:
+    #     the CallStore holding the calls of this history
+    # _outgoing_rows:
+    #     the rows in _store of the outgoing calls, for each (month, year)
+    # _incoming_rows:
+    #     the rows in _store of the incoming calls, for each (month, year)
+    # _view:
+    #     the CallView told about the outgoing calls registered here, or None
     incoming_calls: Dict[Tuple[int, int], List[Call]]
     outgoing_calls: Dict[Tuple[int, int], List[Call]]
+    _store: CallStore
+    _outgoing_rows: Dict[Tuple[int, int], array]
+    _incoming_rows: Dict[Tuple[int, int], array]
+    _view: Optional['CallView']
 
-    def __init__(self) -> None:
-        """ Create an empty CallHistory.
+    def __init__(self, store: Optional[CallStore] = None) -> None:
+        """ Create an empty CallHistory, whose calls are kept in <store>, or
+        in a new CallStore of its own if <store> is None.
+
+        The call histories of a set of customers should share one CallStore,
+        so that each of their calls is only stored once.
         """
-        self.outgoing_calls = {}
-        self.incoming_calls = {}
+        if store is None:
+            store = CallStore()
+        self._store = store
+        self._outgoing_rows = {}
+        self._incoming_rows = {}
+        self._view = None
 
     def register_outgoing_call(self, call: Call) -> None:
         """ Register a Call <call> into this outgoing call history
         """
-        time = (call.get_bill_date()[0], call.get_bill_date()[1])
-        if time in self.outgoing_calls:
-            self.outgoing_calls[time].append(call)
+        time = call.get_bill_date()
+        row = self._store.add(call)
+        # The calls of a new month, or of the last month, come after all the
+        # other outgoing calls of this history
+        last = not self._outgoing_rows or \
+            next(reversed(self._outgoing_rows)) == time
+        if time in self._outgoing_rows:
+            self._outgoing_rows[time].append(row)
         else:
-            self.outgoing_calls[time] = [call]
+            self._outgoing_rows[time] = array('q', [row])
+        if self._view is not None:
+            if last:
+                self._view.add_call(self, call)
+            else:
+                self._view.invalidate(self)
 
     def register_incoming_call(self, call: Call) -> None:
         """ Register a Call <call> into this incoming call history
         """
-        time = (call.get_bill_date()[0], call.get_bill_date()[1])
-        if time in self.incoming_calls:
-            self.incoming_calls[time].append(call)
+        time = call.get_bill_date()
+        row = self._store.add(call)
+        if time in self._incoming_rows:
+            self._incoming_rows[time].append(row)
         else:
-            self.incoming_calls[time] = [call]
+            self._incoming_rows[time] = array('q', [row])
+
+    @property
+    def outgoing_calls(self) -> Dict[Tuple[int, int], List[Call]]:
+        """ Return a new dictionary of the outgoing calls of this history, by
+        (month, year). Deprecated, see the class docstring.
+        """
+        warnings.warn("CallHistory.outgoing_calls is deprecated; use "
+                      "iter_monthly_history", DeprecationWarning, stacklevel=2)
+        return {time: self._store.get_calls(rows)
+                for time, rows in self._outgoing_rows.items()}
+
+    @property
+    def incoming_calls(self) -> Dict[Tuple[int, int], List[Call]]:
+        """ Return a new dictionary of the incoming calls of this history, by
+        (month, year). Deprecated, see the class docstring.
+        """
+        warnings.warn("CallHistory.incoming_calls is deprecated; use "
+                      "iter_monthly_history", DeprecationWarning, stacklevel=2)
+        return {time: self._store.get_calls(rows)
+                for time, rows in self._incoming_rows.items()}
+
+    def extend_rows(self, outgoing: Dict[Tuple[int, int], array],
+                    incoming: Dict[Tuple[int, int], array]) -> None:
+        """ Register the calls stored in the rows <outgoing> and <incoming> of
+        the CallStore of this history, by (month, year), after the calls
+        already registered for each month.
+
+        The calls of this history in its view, if any, are gathered again on
+        the next request of the view.
+        """
+        for rows_by_month, new_rows in [(self._outgoing_rows, outgoing),
+                                        (self._incoming_rows, incoming)]:
+            for time, rows in new_rows.items():
+                if time in rows_by_month:
+                    rows_by_month[time].extend(rows)
+                else:
+                    rows_by_month[time] = array('q', rows)
+        if self._view is not None:
+            self._view.invalidate(self)
+
+    def set_view(self, view: Optional['CallView']) -> None:
+        """ Tell <view> about every outgoing call registered from now on,
+        instead of the previous view, if any. No view is told if <view> is
+        None.
+        """
+        self._view = view
+
+    def get_store(self) -> CallStore:
+        """ Return the CallStore holding the calls of this history
+        """
+        return self._store
+
+    def get_outgoing_rows(self, month: int, year: int) -> array:
+        """ Return the rows in the CallStore of the outgoing calls for <month>
+        and <year>, in the order they were registered. The array must not be
+        modified.
+        """
+        return self._outgoing_rows.get((month, year), _NO_ROWS)
+
+    def get_monthly_rows(self, month: int = None, year: int = None) -> \
+            Tuple[List[int], List[int]]:
+        """ Return the rows in the CallStore of all outgoing and incoming
+        calls for <month> and <year>, as a Tuple containing two lists in the
+        following order: (outgoing rows, incoming rows)
+
+        If <month> and <year> are both None, then return the rows of all calls
+        from this call history.
+
+        The preconditions are the same as for get_monthly_history.
+        """
+        monthly_rows = ([], [])
+        if month is not None and year is not None:
+            if (month, year) in self._outgoing_rows:
+                monthly_rows[0].extend(self._outgoing_rows[(month, year)])
+            if (month, year) in self._incoming_rows:
+                monthly_rows[1].extend(self._incoming_rows[(month, year)])
+        else:
+            for rows in self._outgoing_rows.values():
+                monthly_rows[0].extend(rows)
+            for rows in self._incoming_rows.values():
+                monthly_rows[1].extend(rows)
+        return monthly_rows
+
+    def _iter_calls(self, rows_by_month: Dict[Tuple[int, int], array],
+                    month: Optional[int], year: Optional[int]) \
+            -> Iterator[Call]:
+        """ Return an iterator over the calls whose rows are in
+        <rows_by_month> for <month> and <year>, or for every month if they are
+        both None.
+        """
+        if month is not None and year is not None:
+            rows = rows_by_month.get((month, year), ())
+        else:
+            rows = chain.from_iterable(rows_by_month.values())
+        return map(self._store.get_call, rows)
+
+    def iter_monthly_history(self, month: int = None, year: int = None) -> \
+            Tuple[Iterator[Call], Iterator[Call]]:
+        """ Return iterators over all outgoing and incoming calls for <month>
+        and <year>, as a Tuple in the following order:
+        (outgoing calls, incoming calls)
+
+        The calls are produced one at a time as the iterators are consumed,
+        without building any list. No call may be registered into this call
+        history while the iterators are being consumed.
+
+        The preconditions are the same as for get_monthly_history.
+        """
+        return (self._iter_calls(self._outgoing_rows, month, year),
+                self._iter_calls(self._incoming_rows, month, year))
 
     # ----------------------------------------------------------
     # NOTE: You do not need to understand the implementation of
@@ -73,31 +231,140 @@ class CallHistory:
         - if <month> and <year> are specified (non-None), they are both valid
         monthly cycles according to the input dataset
         """
-        monthly_history = ([], [])
-        if month is not None and year is not None:
-            if (month, year) in self.outgoing_calls:
-                for call in self.outgoing_calls[(month, year)]:
-                    monthly_history[0].append(call)
+        outgoing, incoming = self.iter_monthly_history(month, year)
+        return list(outgoing), list(incoming)
 
-            if (month, year) in self.incoming_calls:
-                for call in self.incoming_calls[(month, year)]:
-                    monthly_history[1].append(call)
-        else:
-            for entry in self.outgoing_calls:
-                for call in self.outgoing_calls[entry]:
-                    monthly_history[0].append(call)
-            for entry in self.incoming_calls:
-                for call in self.incoming_calls[entry]:
-                    monthly_history[1].append(call)
-        return monthly_history
+
+class CallView:
+    """ The outgoing calls of a group of call histories, as one list which is
+    reused until the call histories change.
+
+    The list holds the outgoing calls of each call history in the order the
+    histories were added, and of each history by month, as
+    CallHistory.iter_monthly_history. The calls of each history are kept as
+    a segment of their own: registering an outgoing call appends it to the
+    segment of its history, and the list is gathered again from the
+    segments on its next request. The segments, and the view of the parent,
+    if any, are kept up to date the same way. So the order of the calls does
+    not depend on when the list was first built.
+
+    The list is a CallList, so that the filters build indexes over it. It is
+    the same list object for the whole life of the view, and its version is
+    increased every time it is gathered again.
+    """
+    # === Private Attributes ===
+    # _histories:
+    #     the call histories covered by this view
+    # _segments:
+    #     the outgoing calls of each call history of _histories whose calls
+    #     were gathered
+    # _calls:
+    #     the outgoing calls of _histories
+    # _stale:
+    #     whether _calls must be gathered again before it is returned
+    # _parent:
+    #     the view told about every call added to this one, or None
+    _histories: List[CallHistory]
+    _segments: Dict[CallHistory, List[Call]]
+    _calls: CallList
+    _stale: bool
+    _parent: Optional['CallView']
+
+    def __init__(self) -> None:
+        """ Create a CallView without any call history.
+        """
+        self._histories = []
+        self._segments = {}
+        self._calls = CallList()
+        self._stale = True
+        self._parent = None
+
+    def __getstate__(self) -> Dict:
+        """ Return the state of this view for pickling, without the lists of
+        calls, which are gathered again on the next request.
+        """
+        state = self.__dict__.copy()
+        state['_segments'] = {}
+        state['_calls'] = CallList()
+        state['_stale'] = True
+        return state
+
+    def set_parent(self, parent: Optional['CallView']) -> None:
+        """ Tell <parent> about every call added to this view from now on.
+        """
+        self._parent = parent
+
+    def add_history(self, history: CallHistory, notify: bool = True) -> None:
+        """ Add the outgoing calls of <history> to this view. If <notify> is
+        True, <history> tells this view about the calls registered into it
+        from now on; otherwise they are expected to come from a child view.
+        """
+        self._histories.append(history)
+        if notify:
+            history.set_view(self)
+        if not self._stale:
+            self._calls.extend(self._get_segment(history))
+            self._calls.version += 1
+
+    def remove_history(self, history: CallHistory) -> None:
+        """ Remove the outgoing calls of <history> from this view.
+        """
+        if history in self._histories:
+            self._histories.remove(history)
+            self._segments.pop(history, None)
+            self._stale = True
+
+    def add_call(self, history: CallHistory, call: Call) -> None:
+        """ Add <call>, just registered as the last outgoing call of
+        <history>, to this view and to its parent view, if any.
+        """
+        segment = self._segments.get(history)
+        if segment is not None:
+            segment.append(call)
+        self._stale = True
+        if self._parent is not None:
+            self._parent.add_call(history, call)
+
+    def invalidate(self, history: CallHistory) -> None:
+        """ Discard the outgoing calls of <history> in this view and in its
+        parent view, if any, so that they are gathered again on their next
+        request.
+        """
+        self._segments.pop(history, None)
+        self._stale = True
+        if self._parent is not None:
+            self._parent.invalidate(history)
+
+    def _get_segment(self, history: CallHistory) -> List[Call]:
+        """ Return the outgoing calls of <history>, gathering them if needed.
+        """
+        segment = self._segments.get(history)
+        if segment is None:
+            segment = list(history.iter_monthly_history()[0])
+            self._segments[history] = segment
+        return segment
+
+    def get_calls(self) -> List[Call]:
+        """ Return the outgoing calls of the call histories of this view.
+
+        The same list is always returned, and is brought up to date when an
+        outgoing call was registered in a call history, or a call history was
+        removed, since the last request. It must not be modified.
+        """
+        if self._stale:
+            self._calls[:] = chain.from_iterable(
+                self._get_segment(history) for history in self._histories)
+            self._calls.version += 1
+            self._stale = False
+        return self._calls
 
 
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'datetime', 'call'
-            ''
+            'python_ta', 'typing', 'datetime', 'warnings', 'array',
+            'itertools', 'call', 'callstore', 'callindex'
         ],
         'disable': ['R0902', 'R0913'],
         'generated-members': 'pygame.*'
@@ -0,0 +1,301 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import bisect
+import math
+from array import array
+from itertools import chain, compress
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+from call import Call
+
+"""
+=== Module Description ===
+
+This file contains indexes over a list of calls, which let the filters answer
+repeated queries on the same call set without scanning every call.
+
+An index is built for one list of calls, and answers queries with the calls in
+the same order as that list. Building an index costs more than scanning the
+list once, so indexes are only built over a CallList, such as the list of all
+calls returned by ResetFilter, which is queried again and again. The results
+of the filters are plain lists, which are only queried once and are scanned.
+The filters keep the most recently built index of each kind in a cache (see
+get_index), and rebuild it when they are given a different CallList, or when
+the version of the list has changed.
+"""
+
+# Average number of sources, and of destinations, per cell of a GridIndex
+GRID_CELL_LOAD = 4
+
+# Call sets smaller than this are scanned directly instead of being indexed
+MIN_INDEX_SIZE = 1000
+
+# Query results with fewer calls than 1 / SORT_FRACTION of the indexed calls
+# are put back in order by sorting their positions; larger ones by marking
+# their positions in a mask over all the calls
+SORT_FRACTION = 16
+
+
+class CallList(list):
+    """ A list of calls which is queried again and again, so that indexes
+    are built over it.
+
+    The list must only be changed by its owner, which increases its version
+    every time it does.
+
+    === Public Attributes ===
+    version:
+         the number of times the list was changed by its owner
+    """
+    version: int
+
+    def __init__(self, calls: Iterable[Call] = ()) -> None:
+        """ Create a CallList of <calls>, at version 0.
+        """
+        super().__init__(calls)
+        self.version = 0
+
+
+def _select(data: List[Call], positions: List[int]) -> List[Call]:
+    """ Return the calls of <data> at <positions>, once each, in the order of
+    <data>. <positions> may be reordered.
+    """
+    if len(positions) < len(data) // SORT_FRACTION:
+        positions.sort()
+        return list(map(data.__getitem__, dict.fromkeys(positions)))
+    mask = bytearray(len(data))
+    for i in positions:
+        mask[i] = 1
+    return list(compress(data, mask))
+
+
+def _sort_cells(task: Tuple[array, array,
+                            Tuple[float, float, float, float, int]]) \
+        -> Tuple[array, array]:
+    """ Return the (keys, positions) of the endpoints at the (longitudes,
+    latitudes) of <task>, sorted by the key of their cell in the grid with
+    the (min_long, min_lat, width, height, side) of <task>.
+    This may run in a worker process, so the columns are arrays, which are
+    much cheaper to send across than lists.
+    """
+    longs, lats, (min_long, min_lat, width, height, side) = task
+    # The keys are whole floats, which sort and compare like ints but are
+    # cheaper to compute. Sorting is stable, so the endpoints of each cell
+    # stay in order.
+    keys = [(long - min_long) // width * side + (lat - min_lat) // height
+            for long, lat in zip(longs, lats)]
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    return array('d', [keys[i] for i in order]), array('l', order)
+
+
+class GridIndex:
+    """ A uniform grid over the source and destination locations of a list of
+    calls, for rectangle queries.
+
+    === Public Attributes ===
+    data:
+         the indexed calls
+    """
+    # === Private Attributes ===
+    # _min_coords:
+    #     the (long, lat) coordinates of the lower-left corner of the grid
+    # _cell_size:
+    #     the (long, lat) size of each cell
+    # _side:
+    #     number of cells along each side of the grid
+    # _coords:
+    #     the (longitudes, latitudes) of the sources of the calls of <data>,
+    #     and of their destinations
+    # _cells:
+    #     for the sources, and for the destinations, the (keys, positions)
+    #     of the calls of <data> sorted by the key of the cell of that
+    #     endpoint, column * _side + row. The cells of a column are next to
+    #     each other, and the calls of a cell are in the order of <data>.
+    data: List[Call]
+    _min_coords: Tuple[float, float]
+    _cell_size: Tuple[float, float]
+    _side: int
+    _coords: List[Tuple[List[float], List[float]]]
+    _cells: List[Tuple[array, array]]
+
+    def __init__(self, data: List[Call],
+                 map_cells: Callable = map) -> None:
+        """ Build a grid index over the calls in <data>.
+
+        The sources and the destinations are sorted into cells by calling
+        <map_cells> like map, so that a pool of processes may sort both at
+        the same time.
+        """
+        self.data = data
+        self._side = side = max(1, int(math.sqrt(len(data) / GRID_CELL_LOAD)))
+        self._coords = [([call.src_loc[0] for call in data],
+                         [call.src_loc[1] for call in data]),
+                        ([call.dst_loc[0] for call in data],
+                         [call.dst_loc[1] for call in data])]
+        self._cells = [(array('d'), array('l')), (array('d'), array('l'))]
+        if not data:
+            self._min_coords = (0.0, 0.0)
+            self._cell_size = (1.0, 1.0)
+            return
+
+        (src_longs, src_lats), (dst_longs, dst_lats) = self._coords
+        min_long = min(min(src_longs), min(dst_longs))
+        max_long = max(max(src_longs), max(dst_longs))
+        min_lat = min(min(src_lats), min(dst_lats))
+        max_lat = max(max(src_lats), max(dst_lats))
+        self._min_coords = (min_long, min_lat)
+        # Make the cells slightly larger than needed, so that the maximum
+        # coordinates still fall inside the last cell
+        width = (max_long - min_long) / side * 1.000001 or 1.0
+        height = (max_lat - min_lat) / side * 1.000001 or 1.0
+        self._cell_size = (width, height)
+
+        grid = (min_long, min_lat, width, height, side)
+        self._cells = list(map_cells(_sort_cells,
+                                     [(array('d', longs), array('d', lats),
+                                       grid)
+                                      for longs, lats in self._coords]))
+
+    def query(self, lower_long: float, lower_lat: float,
+              upper_long: float, upper_lat: float) -> List[Call]:
+        """ Return the calls with a source or destination location inside the
+        rectangle with the given corners (boundaries included), in the order
+        of <data>.
+        """
+        side = self._side
+        width, height = self._cell_size
+        col_lo = math.floor((lower_long - self._min_coords[0]) / width)
+        col_hi = math.floor((upper_long - self._min_coords[0]) / width)
+        row_lo = math.floor((lower_lat - self._min_coords[1]) / height)
+        row_hi = math.floor((upper_lat - self._min_coords[1]) / height)
+        first_row, last_row = max(0, row_lo), min(side - 1, row_hi)
+        positions = []
+        for (keys, order), (longs, lats) in zip(self._cells, self._coords):
+            for col in range(max(0, col_lo), min(side - 1, col_hi) + 1):
+                base = col * side
+                start = bisect.bisect_left(keys, base + first_row)
+                end = bisect.bisect_left(keys, base + last_row + 1, start)
+                candidates = order[start:end]
+                if col_lo < col < col_hi and row_hi - row_lo >= 2:
+                    # Only the cells of the first and last rows can hold
+                    # calls outside the rectangle
+                    inner_start = bisect.bisect_left(keys, base + row_lo + 1,
+                                                     start, end)
+                    inner_end = bisect.bisect_left(keys, base + row_hi,
+                                                   inner_start, end)
+                    positions.extend(order[inner_start:inner_end])
+                    candidates = chain(order[start:inner_start],
+                                       order[inner_end:end])
+                for i in candidates:
+                    if lower_long <= longs[i] <= upper_long and \
+                            lower_lat <= lats[i] <= upper_lat:
+                        positions.append(i)
+        return _select(self.data, positions)
+
+
+class DurationIndex:
+    """ The calls of a list sorted by duration, for "less than" and "greater
+    than" duration queries.
+
+    === Public Attributes ===
+    data:
+         the indexed calls
+    """
+    # === Private Attributes ===
+    # _order:
+    #     the positions in <data> of the calls, sorted by duration
+    # _durations:
+    #     the durations of the calls, in the order of <_order>
+    data: List[Call]
+    _order: List[int]
+    _durations: List[int]
+
+    def __init__(self, data: List[Call]) -> None:
+        """ Build a duration index over the calls in <data>.
+        """
+        self.data = data
+        durations = [call.duration for call in data]
+        self._order = sorted(range(len(data)), key=durations.__getitem__)
+        self._durations = [durations[i] for i in self._order]
+
+    def shorter_than(self, duration: int) -> List[Call]:
+        """ Return the calls lasting less than <duration> seconds, in the
+        order of <data>.
+        """
+        return self._select(0, bisect.bisect_left(self._durations, duration))
+
+    def longer_than(self, duration: int) -> List[Call]:
+        """ Return the calls lasting more than <duration> seconds, in the
+        order of <data>.
+        """
+        return self._select(bisect.bisect_right(self._durations, duration),
+                            len(self._order))
+
+    def _select(self, start: int, end: int) -> List[Call]:
+        """ Return the calls at the positions _order[start:end] in <data>, in
+        the order of <data>.
+        """
+        if end - start <= len(self._order) // 2:
+            return _select(self.data, self._order[start:end])
+        # Most calls are selected: unmark the few others instead
+        mask = bytearray(b'\x01') * len(self._order)
+        for i in chain(self._order[:start], self._order[end:]):
+            mask[i] = 0
+        return list(compress(self.data, mask))
+
+
+# The most recently built index of each kind, as (data, version of data when
+# the index was built, index)
+_index_cache: Dict[str, Tuple[CallList, int, Any]] = {}
+
+
+def indexable(data: List[Call]) -> bool:
+    """ Return whether indexes should be built over <data>: a CallList of at
+    least MIN_INDEX_SIZE calls.
+    """
+    return isinstance(data, CallList) and len(data) >= MIN_INDEX_SIZE
+
+
+def get_index(kind: str, data: CallList,
+              build: Callable[[List[Call]], Any]) -> Any:
+    """ Return the index of type <kind> for the list of calls <data>, built
+    by calling <build> on <data>.
+
+    The last index of each kind is cached, and reused as long as it is given
+    the same list, at the same version.
+    """
+    cached = _index_cache.get(kind)
+    if cached is not None and cached[0] is data and \
+            cached[1] == data.version:
+        return cached[2]
+    index = build(data)
+    _index_cache[kind] = (data, data.version, index)
+    return index
+
+
+def clear_index_cache() -> None:
+    """ Discard all cached indexes.
+    """
+    _index_cache.clear()
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'math', 'bisect', 'array', 'itertools',
+            'call'
+        ],
+        'disable': ['R0913'],
+        'generated-members': 'pygame.*'
+    })
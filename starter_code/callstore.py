@@ -0,0 +1,249 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import datetime
+from array import array
+from typing import Dict, Iterable, List, Optional, TYPE_CHECKING
+from call import Call
+
+if TYPE_CHECKING:
+    import numpy as np
+    from customer import Customer
+
+"""
+=== Module Description ===
+
+This file contains the CallStore class, a columnar table holding every call
+registered in a call history.
+
+Each call is stored once, as one row of typed arrays, no matter how many call
+histories refer to it; the call histories only keep the row numbers of their
+calls. Call objects are only created from the rows when they are requested,
+e.g. after the store was loaded from a snapshot. The store keeps the Call
+objects it was given or has created, so the same Call object is always
+returned for a row.
+"""
+
+# Moment from which call times are counted, in microseconds
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class CallStore:
+    """ A columnar table of calls.
+
+    === Public Attributes ===
+    times:
+         time of each call, in microseconds since 1970-01-01
+    durations:
+         duration of each call, in seconds
+    src_longs, src_lats:
+         longitude and latitude of the source of each call
+    dst_longs, dst_lats:
+         longitude and latitude of the destination of each call
+    src_ids, dst_ids:
+         id of the source and destination phone number of each call
+
+    === Representation Invariants ===
+    - all the columns have the same length, which is the number of rows
+    - every value in src_ids and dst_ids is the id of a stored phone number
+    """
+    # === Private Attributes ===
+    # _numbers:
+    #     the stored phone numbers; the id of a number is its position
+    # _number_ids:
+    #     the id of each stored phone number
+    # _calls:
+    #     the Call object of each row, or None if it was not created yet
+    # _rows:
+    #     the row of each Call object in _calls, by id of the Call; the
+    #     Call objects are kept in _calls, so their ids are never reused
+    times: array
+    durations: array
+    src_longs: array
+    src_lats: array
+    dst_longs: array
+    dst_lats: array
+    src_ids: array
+    dst_ids: array
+    _numbers: List[str]
+    _number_ids: Dict[str, int]
+    _calls: List[Optional[Call]]
+    _rows: Dict[int, int]
+
+    def __init__(self) -> None:
+        """ Create an empty CallStore.
+        """
+        self.times = array('q')
+        self.durations = array('q')
+        self.src_longs = array('d')
+        self.src_lats = array('d')
+        self.dst_longs = array('d')
+        self.dst_lats = array('d')
+        self.src_ids = array('l')
+        self.dst_ids = array('l')
+        self._numbers = []
+        self._number_ids = {}
+        self._calls = []
+        self._rows = {}
+
+    def __len__(self) -> int:
+        """ Return the number of calls in this store
+        """
+        return len(self.times)
+
+    def number_id(self, number: str) -> int:
+        """ Return the id of the phone number <number>, storing it first if
+        needed.
+        """
+        nid = self._number_ids.get(number)
+        if nid is None:
+            nid = len(self._numbers)
+            self._numbers.append(number)
+            self._number_ids[number] = nid
+        return nid
+
+    def get_number(self, nid: int) -> str:
+        """ Return the phone number with the id <nid>
+        """
+        return self._numbers[nid]
+
+    def __getstate__(self) -> Dict:
+        """ Return the state of this store for pickling, without the Call
+        objects.
+        """
+        state = self.__dict__.copy()
+        del state['_calls']
+        del state['_rows']
+        return state
+
+    def __setstate__(self, state: Dict) -> None:
+        """ Restore this store from the pickled <state>.
+        """
+        self.__dict__.update(state)
+        self._calls = [None] * len(self.times)
+        self._rows = {}
+
+    def extend(self, other: 'CallStore') -> int:
+        """ Append every row of <other> to this store, in the same order, and
+        return the row of the first one in this store.
+        """
+        first = len(self.times)
+        ids = [self.number_id(number) for number in other._numbers]
+        self.times.extend(other.times)
+        self.durations.extend(other.durations)
+        self.src_longs.extend(other.src_longs)
+        self.src_lats.extend(other.src_lats)
+        self.dst_longs.extend(other.dst_longs)
+        self.dst_lats.extend(other.dst_lats)
+        self.src_ids.extend(array('l', map(ids.__getitem__, other.src_ids)))
+        self.dst_ids.extend(array('l', map(ids.__getitem__, other.dst_ids)))
+        self._calls.extend([None] * len(other.times))
+        return first
+
+    def add(self, call: Call) -> int:
+        """ Store <call> and return its row. A call that is already in this
+        store is not stored again.
+
+        Calls are considered immutable once they are stored.
+        """
+        row = self._rows.get(id(call))
+        if row is not None:
+            return row
+        row = len(self.times)
+        delta = call.time - _EPOCH
+        self.times.append((delta.days * 86400 + delta.seconds) * 1000000
+                          + delta.microseconds)
+        self.durations.append(call.duration)
+        self.src_longs.append(call.src_loc[0])
+        self.src_lats.append(call.src_loc[1])
+        self.dst_longs.append(call.dst_loc[0])
+        self.dst_lats.append(call.dst_loc[1])
+        self.src_ids.append(self.number_id(call.src_number))
+        self.dst_ids.append(self.number_id(call.dst_number))
+        self._calls.append(call)
+        self._rows[id(call)] = row
+        return row
+
+    def get_call(self, row: int) -> Call:
+        """ Return the Call stored in <row>.
+        """
+        call = self._calls[row]
+        if call is None:
+            call = Call(self._numbers[self.src_ids[row]],
+                        self._numbers[self.dst_ids[row]],
+                        _EPOCH + datetime.timedelta(
+                            microseconds=self.times[row]),
+                        self.durations[row],
+                        (self.src_longs[row], self.src_lats[row]),
+                        (self.dst_longs[row], self.dst_lats[row]))
+            self._calls[row] = call
+            self._rows[id(call)] = row
+        return call
+
+    def get_row(self, call: Call) -> Optional[int]:
+        """ Return the row of <call> in this store, or None if <call> is not
+        stored here.
+        """
+        return self._rows.get(id(call))
+
+    def get_rows(self, calls: Iterable[Call]) -> List[Optional[int]]:
+        """ Return the row of each call of <calls> in this store, or None for
+        the calls which are not stored here.
+        """
+        return list(map(self._rows.get, map(id, calls)))
+
+    def get_calls(self, rows: Iterable[int]) -> List[Call]:
+        """ Return the Calls stored in <rows>, in the same order.
+        """
+        rows = list(rows)
+        calls = list(map(self._calls.__getitem__, rows))
+        if None in calls:
+            calls = [self.get_call(row) for row in rows]
+        return calls
+
+
+def take_column(column: array, rows: 'np.ndarray') -> 'np.ndarray':
+    """ Return the values of the CallStore column <column> at <rows>.
+
+    The values are copied, so that the column is not kept locked by a NumPy
+    view and more calls can still be added to the store.
+    """
+    # NumPy is only imported when a column is taken, so that the store can be
+    # used without it
+    import numpy as np
+    view = np.frombuffer(column, dtype=column.typecode)
+    values = view[rows]
+    del view
+    return values
+
+
+def get_store(customers: List['Customer']) -> Optional[CallStore]:
+    """ Return the CallStore of the call histories of <customers>, or None
+    if they have no call history.
+    """
+    for cust in customers:
+        for history in cust.get_call_history():
+            return history.get_store()
+    return None
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'datetime', 'array', 'numpy', 'call',
+            'customer'
+        ],
+        'disable': ['R0902', 'C0415'],
+        'generated-members': 'pygame.*'
+    })
@@ -73,7 +73,17 @@ class Contract:
         was made. In other words, you can safely assume that self.bill has been
         already advanced to the right month+year.
         """
-        self.bill.add_billed_minutes(ceil(call.duration / 60.0))
+        self.bill_minutes(ceil(call.duration / 60.0))
+
+    def bill_minutes(self, minutes: int) -> None:
+        """ Add <minutes> minutes of calls to the bill, as if they were
+        billed by bill_call, one call at a time.
+
+        Precondition:
+        - a bill has already been created for the month+year when the calls
+        were made, as for bill_call.
+        """
+        self.bill.add_billed_minutes(minutes)
 
     def cancel_contract(self) -> float:
         """ Return the amount owed in order to close the phone line associated
@@ -123,22 +133,23 @@ class TermContract(Contract):
         self.bill.add_fixed_cost(TERM_MONTHLY_FEE)
         self.bill.set_rates("TERM", TERM_MINS_COST)
 
-    def bill_call(self, call: Call) -> None:
-        """ Add the <call> to the bill.
+    def bill_minutes(self, minutes: int) -> None:
+        """ Add <minutes> minutes of calls to the bill, as if they were
+        billed by bill_call, one call at a time. The minutes are free until
+        TERM_MINS free minutes are used in the month.
 
         Precondition:
-        - a bill has already been created for the month+year when the <call>
-        was made. In other words, you can safely assume that self.bill has been
-        already advanced to the right month+year.
+        - a bill has already been created for the month+year when the calls
+        were made, as for bill_call.
         """
         if self.bill.free_min < TERM_MINS:
-            self.bill.add_free_minutes(ceil(call.duration / 60.0))
+            self.bill.add_free_minutes(minutes)
             if self.bill.free_min > TERM_MINS:
                 extra = self.bill.free_min - TERM_MINS
                 self.bill.free_min = TERM_MINS
                 self.bill.add_billed_minutes(extra)
         else:
-            Contract.bill_call(self, call)
+            Contract.bill_minutes(self, minutes)
 
     def cancel_contract(self) -> float:
         """ Return the amount owed in order to close the phone line associated
@@ -11,10 +11,12 @@ any changes, are expressly prohibited.
 All of the files in this directory and all subdirectories are:
 Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
-from typing import List, Union, Tuple, Dict
+from itertools import chain
+from typing import List, Union, Tuple, Dict, Iterator, Optional
 from phoneline import PhoneLine
 from call import Call
-from callhistory import CallHistory
+from callhistory import CallHistory, CallView
+from registry import LineRegistry
 
 
 class Customer:
@@ -25,15 +27,28 @@ class Customer:
     # _id:
     #     this customer's 4 digit Customer id
     # _phone_lines:
-    #     this customer's phone lines
+    #     this customer's phone lines, in the order they were added
+    # _lines_by_number:
+    #     this customer's phone lines, keyed by their phone number
+    # _registry:
+    #     the LineRegistry kept up to date with this customer's phone lines,
+    #     or None
+    # _view:
+    #     the outgoing calls of this customer's phone lines
     _id: int
     _phone_lines: List[PhoneLine]
+    _lines_by_number: Dict[str, PhoneLine]
+    _registry: Optional[LineRegistry]
+    _view: CallView
 
     def __init__(self, cid: int) -> None:
         """ Create a new Customer with the <cid> id
         """
         self._id = cid
         self._phone_lines = []
+        self._lines_by_number = {}
+        self._registry = None
+        self._view = CallView()
 
     def new_month(self, month: int, year: int) -> None:
         """ Advance to a new month (specified by <month> and <year>) in the
@@ -51,9 +66,9 @@ class Customer:
         Precondition: The phone line associated with the source phone number of
         <call>, is owned by this customer
         """
-        for line in self._phone_lines:
-            if line.get_number() == call.src_number:
-                line.make_call(call)
+        line = self._lines_by_number.get(call.src_number)
+        if line is not None:
+            line.make_call(call)
 
     def receive_call(self, call: Call) -> None:
         """ Record that a call was made to the destination phone number of
@@ -62,21 +77,24 @@ class Customer:
         Precondition: The phone line associated with the destination phone
         number of <call>, is owned by this customer
         """
-        for line in self._phone_lines:
-            if line.get_number() == call.dst_number:
-                line.receive_call(call)
+        line = self._lines_by_number.get(call.dst_number)
+        if line is not None:
+            line.receive_call(call)
 
     def cancel_phone_line(self, number: str) -> Union[float, None]:
         """ Remove PhoneLine with number <number> from this customer and return
         the amount still owed by this customer.
         Return None if <number> is not owned by this customer.
         """
-        fee = None
-        for pl in self._phone_lines:
-            if pl.get_number() is number:
-                self._phone_lines.remove(pl)
-                fee = pl.cancel_line()
-        return fee
+        pl = self._lines_by_number.pop(number, None)
+        if pl is None:
+            return None
+        self._phone_lines.remove(pl)
+        self._view.remove_history(pl.callhistory)
+        pl.callhistory.set_view(None)
+        if self._registry is not None:
+            self._registry.unregister(self, number)
+        return pl.cancel_line()
 
     # ----------------------------------------------------------
     # NOTE: You do not need to understand the implementation of
@@ -88,6 +106,35 @@ class Customer:
         """ Add a new PhoneLine to this customer.
         """
         self._phone_lines.append(pline)
+        self._lines_by_number[pline.get_number()] = pline
+        self._view.add_history(pline.callhistory)
+        if self._registry is not None:
+            self._registry.register(self, pline)
+
+    def set_registry(self, registry: LineRegistry) -> None:
+        """ Attach this customer to <registry>, registering all of its current
+        phone lines. Lines added or cancelled later are kept up to date in
+        <registry>.
+        """
+        self._registry = registry
+        self._view.set_parent(registry.get_view())
+        registry.attach(self)
+
+    def get_registry(self) -> Optional[LineRegistry]:
+        """ Return the LineRegistry this customer is attached to, or None
+        """
+        return self._registry
+
+    def get_phone_lines(self) -> List[PhoneLine]:
+        """ Return a list of all of the phone lines this customer owns
+        """
+        return list(self._phone_lines)
+
+    def get_outgoing_calls(self) -> List[Call]:
+        """ Return all the outgoing calls of this customer, as a list which
+        is kept up to date as calls are made. The list must not be modified.
+        """
+        return self._view.get_calls()
 
     def get_phone_numbers(self) -> List[str]:
         """ Return a list of all of the numbers this customer owns
@@ -105,11 +152,7 @@ class Customer:
     def __contains__(self, item: str) -> bool:
         """ Check if this customer owns the phone number <item>
         """
-        contains = False
-        for line in self._phone_lines:
-            if line.get_number() == item:
-                contains = True
-        return contains
+        return item in self._lines_by_number
 
     def generate_bill(self, month: int, year: int) \
             -> Tuple[int, float, List[Dict]]:
@@ -150,33 +193,39 @@ class Customer:
         customer, as a tuple in the following format:
         (outgoing calls, incoming calls)
         """
-        history = ([], [])
-        for line in self._phone_lines:
-            line_history = line.get_monthly_history()
-            history[0].extend(line_history[0])
-            history[1].extend(line_history[1])
-        return history
+        outgoing, incoming = self.iter_history()
+        return list(outgoing), list(incoming)
+
+    def iter_history(self) \
+            -> Tuple[Iterator[Call], Iterator[Call]]:
+        """ Return iterators over the same calls as get_history, in the same
+        order, without building the lists.
+        """
+        lines = self._phone_lines
+        return (chain.from_iterable(line.iter_monthly_history()[0]
+                                    for line in lines),
+                chain.from_iterable(line.iter_monthly_history()[1]
+                                    for line in lines))
 
     def get_call_history(self, number: str = None) -> List[CallHistory]:
         """ Return the call history for <number>, stored into a list.
         If <number> is not provided, return a list of all call histories for all
         phone lines owned by this customer.
         """
-        history = []
-        for line in self._phone_lines:
-            if number is not None:
-                if line.get_number() == number:
-                    history.append(line.get_call_history())
-            else:
-                history.append(line.get_call_history())
-        return history
+        if number is not None:
+            line = self._lines_by_number.get(number)
+            if line is None:
+                return []
+            return [line.get_call_history()]
+        return [line.get_call_history() for line in self._phone_lines]
 
 
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'phoneline', 'call', 'callhistory'
+            'python_ta', 'typing', 'itertools', 'phoneline', 'call',
+            'callhistory', 'registry'
         ],
         'allowed-io': ['print_bill'],
         'disable': ['R0902', 'R0913'],
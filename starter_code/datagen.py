@@ -0,0 +1,440 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import argparse
+import datetime
+import random
+import sys
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+"""
+=== Module Description ===
+
+This file contains a generator for synthetic MewbileTech datasets, in the
+same {"events": [...], "customers": [...]} format as the input dataset, or as
+NDJSON with one event per line.
+
+The output is fully determined by the seed and the other settings. Events are
+generated and written one batch at a time, so datasets much larger than memory
+can be produced:
+
+    python datagen.py --events 10000000 --customers 50000 --output big.json
+"""
+
+# Toronto map boundaries, as (long, lat) of the lower-left and upper-right
+MAP_LOWER = (-79.697878, 43.576959)
+MAP_UPPER = (-79.196382, 43.799568)
+
+CONTRACT_TYPES = ['mtm', 'term', 'prepaid']
+
+# Number of events formatted before each write to the output
+WRITE_BATCH = 10000
+
+
+class GeneratorConfig:
+    """ Settings for a synthetic dataset.
+
+    === Public Attributes ===
+    customers:
+         number of customers
+    min_lines, max_lines:
+         range of the number of phone lines per customer
+    contract_mix:
+         relative weight of each contract type
+    events:
+         total number of events
+    call_ratio:
+         fraction of the events that are calls; the rest are SMS
+    mean_duration:
+         mean call duration in seconds; durations are exponentially
+         distributed
+    max_duration:
+         longest allowed call duration in seconds
+    hotspots:
+         number of geographic hot spots inside the map
+    hotspot_share:
+         fraction of locations drawn around a hot spot, the rest being
+         uniform over the map
+    hotspot_radius:
+         standard deviation of the locations around a hot spot, in degrees
+    start_year, start_month:
+         first month of the dataset
+    months:
+         number of months the events are spread over
+    seed:
+         seed for the random number generator
+
+    === Representation Invariants ===
+    - 1 <= min_lines <= max_lines
+    - 0 <= call_ratio <= 1
+    - 0 <= hotspot_share <= 1
+    - months >= 1
+    """
+    customers: int
+    min_lines: int
+    max_lines: int
+    contract_mix: Dict[str, float]
+    events: int
+    call_ratio: float
+    mean_duration: float
+    max_duration: int
+    hotspots: int
+    hotspot_share: float
+    hotspot_radius: float
+    start_year: int
+    start_month: int
+    months: int
+    seed: int
+
+    def __init__(self, customers: int = 100, min_lines: int = 1,
+                 max_lines: int = 5,
+                 contract_mix: Optional[Dict[str, float]] = None,
+                 events: int = 10000, call_ratio: float = 0.8,
+                 mean_duration: float = 180.0, max_duration: int = 7200,
+                 hotspots: int = 5, hotspot_share: float = 0.6,
+                 hotspot_radius: float = 0.01, start_year: int = 2018,
+                 start_month: int = 1, months: int = 3,
+                 seed: int = 148) -> None:
+        """ Create a new configuration with the given settings.
+        """
+        self.customers = customers
+        self.min_lines = min_lines
+        self.max_lines = max_lines
+        if contract_mix is None:
+            contract_mix = {'mtm': 1.0, 'term': 1.0, 'prepaid': 1.0}
+        self.contract_mix = contract_mix
+        self.events = events
+        self.call_ratio = call_ratio
+        self.mean_duration = mean_duration
+        self.max_duration = max_duration
+        self.hotspots = hotspots
+        self.hotspot_share = hotspot_share
+        self.hotspot_radius = hotspot_radius
+        self.start_year = start_year
+        self.start_month = start_month
+        self.months = months
+        self.seed = seed
+
+
+def _month_start(year: int, month: int, offset: int) -> datetime.datetime:
+    """ Return the first moment of the month <offset> months after <month> of
+    <year>.
+    """
+    index = year * 12 + month - 1 + offset
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+class DatasetGenerator:
+    """ A deterministic generator of customers and events for one
+    GeneratorConfig.
+
+    === Public Attributes ===
+    config:
+         the settings of the dataset
+    """
+    # === Private Attributes ===
+    # _rng:
+    #     the random number generator; all randomness comes from it
+    # _numbers:
+    #     every phone number of every customer
+    # _hotspots:
+    #     the (long, lat) centres of the geographic hot spots
+    # _customers:
+    #     the customer records of the dataset
+    config: GeneratorConfig
+    _rng: random.Random
+    _numbers: List[str]
+    _hotspots: List[Tuple[float, float]]
+    _customers: List[Dict]
+
+    def __init__(self, config: GeneratorConfig) -> None:
+        """ Create a generator for <config>, with its customers.
+        """
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._numbers = []
+        self._hotspots = [(self._rng.uniform(MAP_LOWER[0], MAP_UPPER[0]),
+                           self._rng.uniform(MAP_LOWER[1], MAP_UPPER[1]))
+                          for _ in range(config.hotspots)]
+        self._customers = self._make_customers()
+
+    def customers(self) -> List[Dict]:
+        """ Return the customer records of the dataset. Every call returns the
+        same records.
+        """
+        return self._customers
+
+    def _make_customers(self) -> List[Dict]:
+        """ Return new customer records, and add their phone numbers to
+        _numbers.
+        """
+        config = self.config
+        types = [t for t in CONTRACT_TYPES if config.contract_mix.get(t, 0)]
+        weights = [config.contract_mix[t] for t in types]
+        records = []
+        for i in range(config.customers):
+            lines = []
+            for _ in range(self._rng.randint(config.min_lines,
+                                             config.max_lines)):
+                n = len(self._numbers)
+                number = '{0:03d}-{1:04d}'.format(n // 10000 % 1000,
+                                                  n % 10000)
+                self._numbers.append(number)
+                lines.append({'number': number,
+                              'contract': self._rng.choices(types,
+                                                            weights)[0]})
+            records.append({'lines': lines, 'id': 1000 + i})
+        return records
+
+    def _rows(self) -> Iterator[Tuple]:
+        """ Yield the events of the dataset in chronological order, as
+        (type, src_number, dst_number, time, duration, src_long, src_lat,
+        dst_long, dst_lat) tuples, where duration is None for SMS.
+
+        The events are spread evenly over the months, so that no month is
+        left without activity as long as there are at least as many events
+        as months.
+        """
+        config = self.config
+        rng = self._rng
+        random_ = rng.random
+        uniform = rng.uniform
+        gauss = rng.gauss
+        expovariate = rng.expovariate
+        numbers = self._numbers
+        n_numbers = len(numbers)
+        hotspots = self._hotspots
+        share = config.hotspot_share if hotspots else 0.0
+        radius = config.hotspot_radius
+        min_long, min_lat = MAP_LOWER
+        max_long, max_lat = MAP_UPPER
+        rate = 1 / config.mean_duration
+
+        months = [_month_start(config.start_year, config.start_month, i)
+                  for i in range(config.months + 1)]
+        for month in range(config.months):
+            start = months[month]
+            length = (months[month + 1] - start).total_seconds()
+            count = (config.events * (month + 1) // config.months
+                     - config.events * month // config.months)
+            day_text = {}
+            for i in range(count):
+                # Jitter each event inside its own slot, so that the events
+                # stay in order
+                offset = int((i + random_()) * length / count)
+                day, second = divmod(offset, 86400)
+                if day not in day_text:
+                    day_text[day] = str(start.date()
+                                        + datetime.timedelta(days=day))
+                time = '%s %02d:%02d:%02d' % (day_text[day], second // 3600,
+                                              second // 60 % 60, second % 60)
+
+                locs = []
+                for _ in range(2):
+                    if random_() < share:
+                        centre = hotspots[int(random_() * len(hotspots))]
+                        long = gauss(centre[0], radius)
+                        lat = gauss(centre[1], radius)
+                        locs.append(min(max(long, min_long), max_long))
+                        locs.append(min(max(lat, min_lat), max_lat))
+                    else:
+                        locs.append(uniform(min_long, max_long))
+                        locs.append(uniform(min_lat, max_lat))
+
+                duration = None
+                kind = 'sms'
+                if random_() < config.call_ratio:
+                    kind = 'call'
+                    duration = min(int(expovariate(rate)) + 1,
+                                   config.max_duration)
+                yield (kind, numbers[int(random_() * n_numbers)],
+                       numbers[int(random_() * n_numbers)], time,
+                       duration, locs[0], locs[1], locs[2], locs[3])
+
+    def events(self) -> Iterator[Dict]:
+        """ Yield the events of the dataset in chronological order, in the
+        format of the input dataset.
+        """
+        for row in self._rows():
+            event = {'type': row[0], 'src_number': row[1],
+                     'dst_number': row[2], 'time': row[3],
+                     'src_loc': [row[5], row[6]],
+                     'dst_loc': [row[7], row[8]]}
+            if row[4] is not None:
+                event['duration'] = row[4]
+            yield event
+
+    def dataset(self) -> Dict[str, List[Dict]]:
+        """ Return the whole dataset in memory, in the format of the input
+        dataset.
+        """
+        customers = self.customers()
+        return {'events': list(self.events()), 'customers': customers}
+
+
+def _format_row(row: Tuple) -> str:
+    """ Return the JSON text of the generated event <row>.
+
+    The keys and value types of generated events are known, so they are
+    formatted directly rather than through json.dumps.
+    """
+    if row[4] is None:
+        return _SMS_FORMAT % (row[1], row[2], row[3], row[5], row[6],
+                              row[7], row[8])
+    return _CALL_FORMAT % (row[1], row[2], row[3], row[4], row[5], row[6],
+                           row[7], row[8])
+
+
+_CALL_FORMAT = '{"type": "call", "src_number": "%s", "dst_number": "%s", ' \
+               '"time": "%s", "duration": %d, "src_loc": [%r, %r], ' \
+               '"dst_loc": [%r, %r]}'
+_SMS_FORMAT = '{"type": "sms", "src_number": "%s", "dst_number": "%s", ' \
+              '"time": "%s", "src_loc": [%r, %r], "dst_loc": [%r, %r]}'
+
+
+def _format_customer(customer: Dict) -> str:
+    """ Return the JSON text of the generated <customer>.
+    """
+    lines = ', '.join('{{"number": "{0}", "contract": "{1}"}}'.format(
+        line['number'], line['contract']) for line in customer['lines'])
+    return '{{"lines": [{0}], "id": {1}}}'.format(lines, customer['id'])
+
+
+def write_dataset(generator: DatasetGenerator, out: TextIO,
+                  ndjson: bool = False) -> None:
+    """ Write the dataset of <generator> to <out>, as a JSON dataset, or as
+    NDJSON events (one per line, without the customers) if <ndjson> is True.
+    """
+    customers = generator.customers()
+    separator = '\n' if ndjson else ',\n'
+    if not ndjson:
+        out.write('{"events": [\n')
+    batch = []
+    first = True
+    for row in generator._rows():
+        batch.append(_format_row(row))
+        if len(batch) == WRITE_BATCH:
+            if not first:
+                out.write(separator)
+            out.write(separator.join(batch))
+            first = False
+            batch = []
+    if batch:
+        if not first:
+            out.write(separator)
+        out.write(separator.join(batch))
+    if ndjson:
+        out.write('\n')
+    else:
+        out.write('\n],\n"customers": [\n')
+        out.write(',\n'.join(_format_customer(c) for c in customers))
+        out.write('\n]}\n')
+
+
+def write_customers(generator: DatasetGenerator, out: TextIO) -> None:
+    """ Write only the customers of <generator> to <out>, as a JSON dataset
+    without events. This is the companion file of an NDJSON event file.
+    """
+    out.write('{"customers": [\n')
+    out.write(',\n'.join(_format_customer(c)
+                         for c in generator.customers()))
+    out.write('\n]}\n')
+
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    """ Return the contract mix described by <text>, e.g.
+    "mtm=2,term=1,prepaid=1".
+    """
+    mix = {}
+    for item in text.split(','):
+        name, weight = item.split('=')
+        if name.strip() not in CONTRACT_TYPES:
+            raise ValueError("Unknown contract type: " + name)
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """ Generate a dataset from the command line arguments <argv>.
+    """
+    defaults = GeneratorConfig()
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic MewbileTech dataset")
+    parser.add_argument('--customers', type=int, default=defaults.customers)
+    parser.add_argument('--lines', default='{},{}'.format(
+        defaults.min_lines, defaults.max_lines),
+                        help="min,max phone lines per customer")
+    parser.add_argument('--contract-mix', default='mtm=1,term=1,prepaid=1')
+    parser.add_argument('--events', type=int, default=defaults.events)
+    parser.add_argument('--call-ratio', type=float,
+                        default=defaults.call_ratio)
+    parser.add_argument('--mean-duration', type=float,
+                        default=defaults.mean_duration)
+    parser.add_argument('--max-duration', type=int,
+                        default=defaults.max_duration)
+    parser.add_argument('--hotspots', type=int, default=defaults.hotspots)
+    parser.add_argument('--hotspot-share', type=float,
+                        default=defaults.hotspot_share)
+    parser.add_argument('--hotspot-radius', type=float,
+                        default=defaults.hotspot_radius)
+    parser.add_argument('--start', default='2018-01',
+                        help="first month, as YYYY-MM")
+    parser.add_argument('--months', type=int, default=defaults.months)
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('--output', default='-',
+                        help="output file; names ending in .ndjson get one "
+                             "event per line (default: standard output)")
+    parser.add_argument('--customers-output',
+                        help="with NDJSON output, also write the customers "
+                             "to this JSON file")
+    args = parser.parse_args(argv)
+
+    min_lines, max_lines = (int(n) for n in args.lines.split(','))
+    start_year, start_month = (int(n) for n in args.start.split('-'))
+    config = GeneratorConfig(
+        customers=args.customers, min_lines=min_lines, max_lines=max_lines,
+        contract_mix=_parse_mix(args.contract_mix), events=args.events,
+        call_ratio=args.call_ratio, mean_duration=args.mean_duration,
+        max_duration=args.max_duration, hotspots=args.hotspots,
+        hotspot_share=args.hotspot_share,
+        hotspot_radius=args.hotspot_radius, start_year=start_year,
+        start_month=start_month, months=args.months, seed=args.seed)
+
+    ndjson = args.output.endswith('.ndjson')
+    if args.output == '-':
+        write_dataset(DatasetGenerator(config), sys.stdout)
+    else:
+        with open(args.output, 'w') as out:
+            write_dataset(DatasetGenerator(config), out, ndjson)
+    if args.customers_output:
+        with open(args.customers_output, 'w') as out:
+            write_customers(DatasetGenerator(config), out)
+
+
+if __name__ == '__main__':
+    main()
+    import python_ta
+    from contextlib import redirect_stdout
+    # The dataset may be written to standard output, so the report goes to
+    # standard error
+    with redirect_stdout(sys.stderr):
+        python_ta.check_all(config={
+            'allowed-import-modules': [
+                'python_ta', 'contextlib', 'typing', 'argparse', 'datetime',
+                'random', 'sys'
+            ],
+            'allowed-io': [
+                'main'
+            ],
+            'generated-members': 'pygame.*'
+        })
@@ -0,0 +1,233 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import datetime
+import json
+from typing import Any, Dict, Iterator, List, TextIO
+
+"""
+=== Module Description ===
+
+This file contains readers that parse the input dataset incrementally, so that
+the events can be fed into the billing system one at a time, without holding
+the whole parsed document in memory.
+
+Two formats are supported:
+- the regular JSON dataset, {"events": [...], "customers": [...]}, read in
+  fixed-size chunks
+- NDJSON event files, with one JSON event object per line
+"""
+
+# Number of characters read from the file at a time
+CHUNK_SIZE = 1 << 16
+
+# Format of the event timestamps in the dataset
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_WHITESPACE = ' \t\n\r'
+
+
+class _ChunkedJson:
+    """ A buffered reader over a JSON document, which decodes one value at a
+    time from chunks of the underlying file.
+    """
+    # === Private Attributes ===
+    # _file:
+    #     the open file being read
+    # _chunk_size:
+    #     number of characters read from _file at a time
+    # _buf:
+    #     the part of the file read so far and not yet consumed
+    # _pos:
+    #     position of the next unconsumed character in _buf
+    # _eof:
+    #     whether the whole file has been read
+    # _decoder:
+    #     the decoder used for individual JSON values
+    _file: TextIO
+    _chunk_size: int
+    _buf: str
+    _pos: int
+    _eof: bool
+    _decoder: json.JSONDecoder
+
+    def __init__(self, file: TextIO, chunk_size: int) -> None:
+        """ Create a reader for the JSON document in <file>.
+        """
+        self._file = file
+        self._chunk_size = chunk_size
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _read_chunk(self) -> bool:
+        """ Read the next chunk of the file, dropping what was consumed.
+        Return False if the end of the file was already reached.
+        """
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if chunk == '':
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """ Skip whitespace and return the next character, without consuming
+        it. Return '' at the end of the file.
+        """
+        while True:
+            while self._pos < len(self._buf) and \
+                    self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._read_chunk():
+                return ''
+
+    def expect(self, char: str) -> None:
+        """ Consume the next non-whitespace character, which must be <char>.
+        """
+        if self.peek() != char:
+            raise ValueError("Malformed dataset: expected " + repr(char))
+        self._pos += 1
+
+    def decode(self) -> Any:
+        """ Consume and return the next complete JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._read_chunk():
+                    raise
+                continue
+            # A value ending exactly at the end of the buffer (e.g. a number)
+            # may continue in the next chunk.
+            if end == len(self._buf) and self._read_chunk():
+                continue
+            self._pos = end
+            return value
+
+    def iter_array(self) -> Iterator[Any]:
+        """ Consume a JSON array, yielding its elements one at a time.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.decode()
+            if self.peek() == ',':
+                self._pos += 1
+            else:
+                self.expect(']')
+                return
+
+    def skip_value(self) -> None:
+        """ Consume the next JSON value. Arrays are consumed element by
+        element.
+        """
+        if self.peek() == '[':
+            for _ in self.iter_array():
+                pass
+        else:
+            self.decode()
+
+
+def parse_time(text: str) -> datetime.datetime:
+    """ Return the date and time in the event timestamp <text>, which is in
+    the TIME_FORMAT format (e.g. "2018-01-01 14:29:05").
+
+    Timestamps in the dataset have a fixed width, which is parsed directly
+    instead of through the much slower datetime.strptime. Anything else falls
+    back to strptime, so invalid timestamps are still rejected.
+    """
+    if len(text) == 19 and text[10] == ' ':
+        try:
+            return datetime.datetime.fromisoformat(text)
+        except ValueError:
+            pass
+    return datetime.datetime.strptime(text, TIME_FORMAT)
+
+
+def iter_json_array(filename: str, key: str,
+                    chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    """ Yield the elements of the array stored under <key> in the top-level
+    JSON object in the file <filename>, one at a time.
+
+    The file is read <chunk_size> characters at a time, and any arrays under
+    other keys that come first are skipped element by element.
+    Yield nothing if the key is missing.
+    """
+    with open(filename) as f:
+        reader = _ChunkedJson(f, chunk_size)
+        reader.expect('{')
+        if reader.peek() == '}':
+            return
+        while True:
+            name = reader.decode()
+            reader.expect(':')
+            if name == key and reader.peek() == '[':
+                yield from reader.iter_array()
+                return
+            reader.skip_value()
+            if reader.peek() == ',':
+                reader.expect(',')
+            else:
+                reader.expect('}')
+                return
+
+
+def iter_ndjson(filename: str) -> Iterator[Dict]:
+    """ Yield the JSON objects stored one per line in the file <filename>.
+    Blank lines are ignored.
+    """
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_events(filename: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict]:
+    """ Yield the events from the dataset <filename>, in order.
+
+    Files ending in ".ndjson" contain one event per line; any other file is
+    read as a regular JSON dataset.
+    """
+    if filename.endswith('.ndjson'):
+        return iter_ndjson(filename)
+    return iter_json_array(filename, 'events', chunk_size)
+
+
+def load_customers(filename: str,
+                   chunk_size: int = CHUNK_SIZE) -> List[Dict]:
+    """ Return the customer records from the JSON dataset <filename>,
+    without keeping its events in memory.
+    """
+    return list(iter_json_array(filename, 'customers', chunk_size))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'json', 'datetime'
+        ],
+        'allowed-io': ['iter_json_array', 'iter_ndjson'],
+        'generated-members': 'pygame.*'
+    })
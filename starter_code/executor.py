@@ -0,0 +1,250 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import math
+import multiprocessing
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple
+from call import Call
+from customer import Customer
+from callstore import CallStore, get_store
+from filter import Filter, ResetFilter, CustomerFilter, DurationFilter, \
+    LocationFilter
+from callindex import GridIndex, get_index, indexable
+
+"""
+=== Module Description ===
+
+This file contains the FilterExecutor class, which applies a filter to a list
+of calls either serially, or split into chunks across a pool of threads or
+processes. The chunk results are merged back in the order of the calls. Each
+executor keeps its pool from one filter to the next, until it is closed.
+
+The duration and location filters answer queries on a large CallList through
+an index over the whole list (see callindex), which is cached between
+queries. Splitting such a list into chunks would build a new index for every
+chunk of every query, so these filters are applied serially to the whole list
+instead, whatever the mode. In the PROCESS mode, the sources and the
+destinations of a new GridIndex are sorted into cells by two processes.
+
+The VECTOR mode evaluates the customer, duration and location filters as NumPy
+masks instead (see vectorfilter); other filters are applied serially.
+
+Process pools are started with the "fork" method: the workers inherit the
+customers and the CallStore of their calls from the parent process. They only
+receive the rows of the calls of their chunk, and send back the rows of the
+matching calls. The pool is forked again once more calls have been stored.
+Calls which are not in that store are filtered serially, as sending them to
+the workers would cost more than filtering them.
+"""
+
+SERIAL = 'serial'
+THREAD = 'thread'
+PROCESS = 'process'
+VECTOR = 'vector'
+
+EXECUTOR_MODES = [SERIAL, THREAD, PROCESS, VECTOR]
+
+# Filters which query a cached index over the whole list of calls, when it
+# is indexable
+INDEXED_FILTERS = (DurationFilter, LocationFilter)
+
+# Filters which keep only the first occurrence of each call, so the merged
+# chunk results must be deduplicated again
+DEDUPLICATING_FILTERS = (CustomerFilter,)
+
+# The (customers, store) inherited by the forked worker processes
+_worker_state: Optional[Tuple[List[Customer], Optional[CallStore]]] = None
+
+
+def _apply_to_rows(task: Tuple[Filter, array, str]) -> array:
+    """ Apply the filter of <task> to the calls stored in its rows, with its
+    filter string, and return the rows of the resulting calls.
+    This runs in a worker process.
+    """
+    f, rows, filter_string = task
+    customers, store = _worker_state
+    result = f.apply(customers, store.get_calls(rows), filter_string)
+    return array('l', store.get_rows(result))
+
+
+class FilterExecutor:
+    """ Applies filters to lists of calls with a configurable executor.
+
+    === Public Attributes ===
+    mode:
+         one of SERIAL, THREAD, PROCESS or VECTOR
+    workers:
+         number of threads or processes the calls are split across; unused
+         in the SERIAL and VECTOR modes
+
+    === Representation Invariants ===
+    - mode in EXECUTOR_MODES
+    - workers >= 1
+    """
+    # === Private Attributes ===
+    # _pool:
+    #     the pool of threads or processes of this executor, or None if it
+    #     is not started
+    # _forked:
+    #     the customers, their store and its number of calls when the pool of
+    #     processes was forked, or None
+    mode: str
+    workers: int
+    _pool: Optional[Any]
+    _forked: Optional[Tuple[List[Customer], Optional[CallStore], int]]
+
+    def __init__(self, mode: str = SERIAL, workers: int = 1) -> None:
+        """ Create a new FilterExecutor running in <mode> with <workers>
+        workers. If the platform cannot fork processes, the PROCESS mode
+        falls back to THREAD.
+        """
+        if mode not in EXECUTOR_MODES:
+            raise ValueError("Unknown executor mode: " + mode)
+        if mode == PROCESS and \
+                'fork' not in multiprocessing.get_all_start_methods():
+            mode = THREAD
+        self.mode = mode
+        self.workers = max(1, workers)
+        self._pool = None
+        self._forked = None
+
+    def __str__(self) -> str:
+        """ Return a description of this executor
+        """
+        return "{} executor with {} worker(s)".format(self.mode, self.workers)
+
+    def apply(self, f: Filter, customers: List[Customer], data: List[Call],
+              filter_string: str) -> List[Call]:
+        """ Return the result of applying the filter <f> to <data>, with the
+        <customers> and <filter_string> arguments of Filter.apply.
+
+        The ResetFilter ignores <data>, so it is always applied serially, and
+        so are the INDEXED_FILTERS on lists large enough to be indexed.
+        The pool of this executor is started the first time it is needed.
+        """
+        if self.mode == VECTOR:
+            # NumPy is only imported when this mode is used
+            from vectorfilter import apply_filter, supports
+            if supports(f):
+                return apply_filter(f, customers, data, filter_string)
+            return f.apply(customers, data, filter_string)
+        if self.mode == SERIAL or self.workers == 1 or \
+                isinstance(f, ResetFilter) or len(data) < 2:
+            return f.apply(customers, data, filter_string)
+        if isinstance(f, INDEXED_FILTERS) and indexable(data):
+            if self.mode == PROCESS and isinstance(f, LocationFilter):
+                pool = self._get_processes(customers)
+                get_index('location', data,
+                          lambda calls: GridIndex(calls, pool.map))
+            return f.apply(customers, data, filter_string)
+
+        chunk_size = math.ceil(len(data) / self.workers)
+        bounds = [(start, min(start + chunk_size, len(data)))
+                  for start in range(0, len(data), chunk_size)]
+        if self.mode == THREAD:
+            new_data = self._apply_threads(f, customers, data, filter_string,
+                                           bounds)
+        else:
+            store = get_store(customers)
+            rows = [] if store is None else store.get_rows(data)
+            if store is None or None in rows:
+                return f.apply(customers, data, filter_string)
+            new_data = self._apply_processes(f, customers, store, rows,
+                                             filter_string, bounds)
+        if isinstance(f, DEDUPLICATING_FILTERS):
+            new_data = list({id(call): call for call in new_data}.values())
+        return new_data
+
+    def close(self) -> None:
+        """ Stop the pool of this executor, if it was started. It is started
+        again if this executor is used afterwards.
+        """
+        if self._pool is None:
+            return
+        if self.mode == THREAD:
+            self._pool.shutdown()
+        else:
+            self._pool.close()
+            self._pool.join()
+        self._pool = None
+        self._forked = None
+
+    def _get_processes(self, customers: List[Customer]) -> Any:
+        """ Return the pool of processes of this executor, forked with
+        <customers> and the current content of their CallStore.
+        """
+        global _worker_state
+        store = get_store(customers)
+        size = 0 if store is None else len(store)
+        forked = self._forked
+        if forked is not None and (forked[0] is not customers or
+                                   forked[1] is not store or
+                                   forked[2] != size):
+            self.close()
+        if self._pool is None:
+            _worker_state = (customers, store)
+            try:
+                context = multiprocessing.get_context('fork')
+                self._pool = context.Pool(processes=self.workers)
+            finally:
+                _worker_state = None
+            self._forked = (customers, store, size)
+        return self._pool
+
+    def _apply_threads(self, f: Filter, customers: List[Customer],
+                       data: List[Call], filter_string: str,
+                       bounds: List[Tuple[int, int]]) -> List[Call]:
+        """ Apply <f> to each chunk of <data> given by <bounds> in the pool of
+        threads of this executor, and merge the results in order.
+        """
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        results = self._pool.map(
+            lambda b: f.apply(customers, data[b[0]:b[1]], filter_string),
+            bounds)
+        new_data = []
+        for res in results:
+            new_data.extend(res)
+        return new_data
+
+    def _apply_processes(self, f: Filter, customers: List[Customer],
+                         store: CallStore, rows: List[int],
+                         filter_string: str,
+                         bounds: List[Tuple[int, int]]) -> List[Call]:
+        """ Apply <f> to each chunk of the calls stored in <rows> of <store>
+        given by <bounds>, in the pool of processes of this executor, and
+        merge the results in order.
+        """
+        pool = self._get_processes(customers)
+        results = pool.map(_apply_to_rows,
+                           [(f, array('l', rows[start:end]), filter_string)
+                            for start, end in bounds])
+        new_data = []
+        for res in results:
+            new_data.extend(store.get_calls(res))
+        return new_data
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'math', 'multiprocessing', 'array',
+            'concurrent.futures', 'call', 'customer', 'callstore', 'filter',
+            'callindex', 'vectorfilter'
+        ],
+        'disable': ['R0913', 'W0603', 'C0415'],
+        'generated-members': 'pygame.*'
+    })
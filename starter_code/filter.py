@@ -13,9 +13,11 @@ Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
 import time
 import datetime
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from call import Call
 from customer import Customer
+from callindex import GridIndex, DurationIndex, get_index, indexable
+from registry import get_registry
 
 
 class Filter:
@@ -67,15 +69,15 @@ class ResetFilter(Filter):
         The <data> and <filter_string> arguments for this type of filter are
         ignored.
 
+        The outgoing calls of the customers are kept up to date in the
+        LineRegistry they are attached to, so this returns that list without
+        walking every call history. The list must not be modified.
+
         Precondition:
         - <customers> contains the list of all customers from the input dataset
         """
-        filtered_calls = []
-        for c in customers:
-            customer_history = c.get_history()
-            # only take outgoing calls, we don't want to include calls twice
-            filtered_calls.extend(customer_history[0])
-        return filtered_calls
+        # only take outgoing calls, we don't want to include calls twice
+        return get_registry(customers).get_all_calls()
 
     def __str__(self) -> str:
         """ Return a description of this filter to be displayed in the UI menu
@@ -83,28 +85,82 @@ class ResetFilter(Filter):
         return "Reset all of the filters applied so far, if any"
 
 
+def parse_customer_id(filter_string: str) -> Optional[int]:
+    """ Return the customer id in the CustomerFilter string <filter_string>,
+    or None if it is invalid.
+    """
+    try:
+        return int(filter_string)
+    except ValueError:
+        return None
+
+
+def parse_duration(filter_string: str) -> Optional[int]:
+    """ Return the duration in the DurationFilter string <filter_string>, or
+    None if it is invalid. The first character of a valid filter string is
+    "L" or "G".
+
+    A negative duration is returned as well; the filter has no effect then.
+    """
+    if len(filter_string) >= 2 and filter_string[0] in ["L", "G"]:
+        try:
+            return int(filter_string[1:])
+        except ValueError:
+            pass
+    return None
+
+
+def parse_location(filter_string: str) -> Optional[List[float]]:
+    """ Return the lowerLong, lowerLat, upperLong, upperLat coordinates in
+    the LocationFilter string <filter_string>, or None if it is invalid.
+    """
+    try:
+        coordinate_list = []
+        item_list = filter_string.split(",")
+        for item in item_list:
+            coordinate_list.append(float(item))
+    except ValueError:
+        return None
+    if len(coordinate_list) == 4:
+        if -79.697878 <= coordinate_list[0] <= -79.196382 and\
+                43.576959 <= coordinate_list[1] <= 43.799568 and\
+                -79.697878 <= coordinate_list[2] <= -79.196382 and\
+                43.576959 <= coordinate_list[3] <= 43.799568 and\
+                coordinate_list[0] <= coordinate_list[2] and\
+                coordinate_list[1] <= coordinate_list[3]:
+            return coordinate_list
+    return None
+
+
 def _helper1(customers: List[Customer], data: List[Call],
              filtering_id: int) -> List[Call]:
-    """Simplify customer filtering."""
-    new_data = []
+    """Simplify customer filtering.
+
+    The calls of the matching customers are collected into a set once, so
+    that each call in <data> is checked in constant time.
+    """
+    customer_calls = set()
     ever_reached = False
-    for calls in data:
-        for cust in customers:
-            if cust.get_id() == filtering_id:
-                ever_reached = True
-                _helper2(calls, cust, new_data)
-    if ever_reached:
-        return new_data
-    else:
+    for cust in customers:
+        if cust.get_id() == filtering_id:
+            ever_reached = True
+            _helper2(cust, customer_calls)
+    if not ever_reached:
         return data
+    new_data = []
+    for calls in data:
+        if calls in customer_calls:
+            new_data.append(calls)
+            # only keep the first occurrence of each call
+            customer_calls.remove(calls)
+    return new_data
 
 
-def _helper2(calls: Call, cust: Customer, new_data: list) -> None:
-    """Help the helper."""
-    if calls in cust.get_history()[0] or calls in \
-            cust.get_history()[1]:
-        if calls not in new_data:
-            new_data.append(calls)
+def _helper2(cust: Customer, customer_calls: set) -> None:
+    """Add every call made or received by <cust> to <customer_calls>."""
+    outgoing, incoming = cust.iter_history()
+    customer_calls.update(outgoing)
+    customer_calls.update(incoming)
 
 
 class CustomerFilter(Filter):
@@ -126,11 +182,8 @@ class CustomerFilter(Filter):
         - If the filter string is invalid, your code must not crash, as
         specified in the handout.
         """
-        try:
-            filtering_id = int(filter_string)
-        except ValueError:
-            pass
-        else:
+        filtering_id = parse_customer_id(filter_string)
+        if filtering_id is not None:
             data = _helper1(customers, data, filtering_id)
         return data
 
@@ -141,8 +194,17 @@ class CustomerFilter(Filter):
 
 
 def _helper3(duration: int, filter_string: str, data: List[Call]) -> List[Call]:
-    """Help location filter."""
+    """Help location filter.
+
+    A large CallList is queried through a DurationIndex, which is built once
+    per version of the list; any other list of calls is scanned.
+    """
     if duration >= 0:
+        if indexable(data):
+            index = get_index('duration', data, DurationIndex)
+            if filter_string[0] == "G":
+                return index.longer_than(duration)
+            return index.shorter_than(duration)
         new_data = []
         _helper4(filter_string, data, new_data, duration)
         return new_data
@@ -183,14 +245,9 @@ class DurationFilter(Filter):
         - If the filter string is invalid, your code must not crash, as
         specified in the handout.
         """
-        if len(filter_string) >= 2 and filter_string[0] in ["L", "G"]:
-            string_duration = filter_string[1:]
-            try:
-                duration = int(string_duration)
-            except ValueError:
-                pass
-            else:
-                data = _helper3(duration, filter_string, data)
+        duration = parse_duration(filter_string)
+        if duration is not None:
+            data = _helper3(duration, filter_string, data)
         return data
 
     def __str__(self) -> str:
@@ -214,6 +271,19 @@ def _helper5(data: List[Call], coordinate_list: List[float],
             new_data.append(calls)
 
 
+def _helper6(data: List[Call], coordinate_list: List[float]) -> List[Call]:
+    """Return the calls from <data> inside the rectangle <coordinate_list>.
+
+    A large CallList is queried through a GridIndex, which is built once per
+    version of the list; any other list of calls is scanned.
+    """
+    if indexable(data):
+        return get_index('location', data, GridIndex).query(*coordinate_list)
+    new_data = []
+    _helper5(data, coordinate_list, new_data)
+    return new_data
+
+
 class LocationFilter(Filter):
     """
     A class for selecting only the calls that took place within a specific area
@@ -242,24 +312,9 @@ class LocationFilter(Filter):
         - If the filter string is invalid, your code must not crash, as
         specified in the handout.
         """
-        try:
-            coordinate_list = []
-            item_list = filter_string.split(",")
-            for item in item_list:
-                coordinate_list.append(float(item))
-        except ValueError:
-            pass
-        else:
-            if len(coordinate_list) == 4:
-                if -79.697878 <= coordinate_list[0] <= -79.196382 and\
-                        43.576959 <= coordinate_list[1] <= 43.799568 and\
-                        -79.697878 <= coordinate_list[2] <= -79.196382 and\
-                        43.576959 <= coordinate_list[3] <= 43.799568 and\
-                        coordinate_list[0] <= coordinate_list[2] and\
-                        coordinate_list[1] <= coordinate_list[3]:
-                    new_data = []
-                    _helper5(data, coordinate_list, new_data)
-                    data = new_data
+        coordinate_list = parse_location(filter_string)
+        if coordinate_list is not None:
+            data = _helper6(data, coordinate_list)
         return data
 
     def __str__(self) -> str:
@@ -274,7 +329,8 @@ if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
         'allowed-import-modules': [
-            'python_ta', 'typing', 'time', 'datetime', 'call', 'customer'
+            'python_ta', 'typing', 'time', 'datetime', 'call', 'customer',
+            'callindex', 'registry'
         ],
         'max-nested-blocks': 4,
         'allowed-io': ['apply', '__str__'],
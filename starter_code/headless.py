@@ -0,0 +1,188 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Iterable, List, Optional, Sequence, TextIO, Tuple
+from customer import Customer
+from application import import_customers, create_customers, \
+    stream_event_history
+from billing import CustomerBill
+from billexport import CSV, NDJSON, iter_customer_bills, iter_bill_rows, \
+    write_bill_rows, open_export
+from snapshot import load_snapshot, save_snapshot
+
+"""
+=== Module Description ===
+
+This file contains the headless command line mode of the billing system. It
+processes a dataset and writes the bills of every customer, for a range of
+months, as CSV, NDJSON or JSON:
+
+    python headless.py --dataset dataset.json --start 2018-01 --end 2018-06 \\
+        --format csv --output bills.csv.gz
+
+The CSV and NDJSON outputs are streamed by the billexport module, with a row
+for every phone line bill and a row with the totals of every customer bill,
+and are compressed with gzip if the output file ends with ".gz" or --gzip is
+given. The JSON output is a single list, built in memory.
+
+Unlike application.py, it never imports the user interface (pygame and
+tkinter), so it can run on servers without a display.
+"""
+
+# Output formats, besides the ones of billexport
+JSON = 'json'
+FORMATS = [CSV, NDJSON, JSON]
+
+
+def parse_month(text: str) -> Tuple[int, int]:
+    """ Return the (month, year) of <text>, in the "YYYY-MM" format.
+
+    Raise a ValueError if <text> is not a valid month.
+    """
+    year, _, month = text.partition('-')
+    if not (year.isdigit() and month.isdigit() and 1 <= int(month) <= 12):
+        raise ValueError("Invalid month: " + text)
+    return int(month), int(year)
+
+
+def billed_months(customers: List[Customer],
+                  start: Optional[Tuple[int, int]] = None,
+                  end: Optional[Tuple[int, int]] = None) \
+        -> List[Tuple[int, int]]:
+    """ Return the (month, year) of every month with a bill for a phone line
+    of <customers>, between <start> and <end> included if they are given, in
+    chronological order.
+    """
+    months = {key for cust in customers for line in cust.get_phone_lines()
+              for key in line.bills}
+    ordered = sorted(months, key=lambda key: (key[1], key[0]))
+    return [(month, year) for month, year in ordered
+            if (start is None or (year, month) >= (start[1], start[0])) and
+            (end is None or (year, month) <= (end[1], end[0]))]
+
+
+def load_dataset(dataset: str, snapshot: Optional[str] = None,
+                 customer_file: Optional[str] = None) -> List[Customer]:
+    """ Return the customers of the dataset file <dataset>, with all of its
+    events processed. The events are streamed from the file.
+
+    The customers are read from the JSON dataset <customer_file> if it is
+    given, which is needed when <dataset> is an NDJSON file of events. Raise
+    a ValueError if no customers are found.
+
+    If <snapshot> is given, the customers are loaded from that snapshot file
+    if it was made from <dataset>; otherwise they are saved into it.
+    """
+    if snapshot is not None and os.path.exists(snapshot):
+        try:
+            return load_snapshot(snapshot, dataset)
+        except ValueError as error:
+            print("Ignoring the snapshot:", error, file=sys.stderr)
+    if customer_file is None and dataset.endswith('.ndjson'):
+        raise ValueError("The customers of an NDJSON dataset must be given "
+                         "with --customers")
+    customers = create_customers(import_customers(customer_file or dataset))
+    if not customers:
+        raise ValueError("No customers in " + (customer_file or dataset))
+    stream_event_history(dataset, customers)
+    if snapshot is not None:
+        save_snapshot(snapshot, customers, dataset)
+    return customers
+
+
+def write_json(out: TextIO, bills: Iterable[Tuple[int, int, CustomerBill]]) \
+        -> None:
+    """ Write <bills>, as (month, year, customer bill) tuples, to <out> as a
+    JSON list, with one object per customer bill.
+    """
+    json.dump([{'customer': cust_id, 'month': month, 'year': year,
+                'total': total, 'lines': lines}
+               for month, year, (cust_id, total, lines) in bills], out)
+    out.write('\n')
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """ Run the headless billing with the command line arguments <argv>, and
+    return the exit status.
+    """
+    parser = argparse.ArgumentParser(
+        description="Write the bills of every customer of a dataset")
+    parser.add_argument('--dataset', default='dataset.json',
+                        help="JSON or NDJSON dataset to process")
+    parser.add_argument('--customers', metavar='FILE',
+                        help="JSON dataset with the customers, if they are "
+                             "not in the dataset (default: the dataset)")
+    parser.add_argument('--start', type=parse_month, metavar='YYYY-MM',
+                        help="first month to bill (default: the first month "
+                             "of the dataset)")
+    parser.add_argument('--end', type=parse_month, metavar='YYYY-MM',
+                        help="last month to bill (default: the last month "
+                             "of the dataset)")
+    parser.add_argument('--format', choices=FORMATS, default=CSV,
+                        help="output format")
+    parser.add_argument('--output', metavar='FILE',
+                        help="file to write the bills to (default: standard "
+                             "output)")
+    parser.add_argument('--gzip', action='store_true',
+                        help="compress the output file with gzip")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="number of processes billing the customers")
+    parser.add_argument('--snapshot', metavar='FILE',
+                        help="load the processed dataset from this snapshot, "
+                             "or save it there if it is missing or stale")
+    args = parser.parse_args(argv)
+
+    try:
+        customers = load_dataset(args.dataset, args.snapshot, args.customers)
+    except ValueError as error:
+        print("ERROR:", error, file=sys.stderr)
+        return 1
+    bills = iter_customer_bills(
+        customers, billed_months(customers, args.start, args.end),
+        args.workers)
+    out = sys.stdout if args.output is None else \
+        open_export(args.output, args.gzip)
+    try:
+        if args.format == JSON:
+            write_json(out, bills)
+        else:
+            write_bill_rows(out, iter_bill_rows(bills), args.format)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    status = main()
+    import python_ta
+    from contextlib import redirect_stdout
+    # The bills may be written to standard output, so the report goes to
+    # standard error
+    with redirect_stdout(sys.stderr):
+        python_ta.check_all(config={
+            'allowed-import-modules': [
+                'python_ta', 'contextlib', 'typing', 'argparse', 'json', 'os',
+                'sys', 'customer', 'application', 'billing', 'billexport',
+                'snapshot'
+            ],
+            'allowed-io': [
+                'load_dataset', 'main'
+            ],
+            'generated-members': 'pygame.*'
+        })
+    sys.exit(status)
@@ -0,0 +1,103 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+from typing import Dict, List, Optional, Sequence
+from customer import Customer
+from application import process_events
+
+"""
+=== Module Description ===
+
+This file contains the incremental ingestion of events: new batches of events,
+e.g. a daily feed, are applied to customers whose earlier events were already
+processed, instead of processing the whole event history again.
+
+A batch only costs as much as its own events. The customers are advanced with
+new_month only for the months that were not seen yet, so the bills of the
+current month keep the calls that were billed before the batch.
+"""
+
+
+class EventIngester:
+    """ The ingestion of batches of events into a list of customers.
+
+    === Public Attributes ===
+    customers:
+         the customers the events are applied to
+
+    === Representation Invariants ===
+    - the customers were advanced to the month of the last event processed
+    """
+    # === Private Attributes ===
+    # _last_time:
+    #     the time of the last event processed, in the format of the dataset,
+    #     or None if no event was processed yet
+    customers: List[Customer]
+    _last_time: Optional[str]
+
+    def __init__(self, customer_list: List[Customer],
+                 last_time: Optional[str] = None) -> None:
+        """ Create an ingester for the customers in <customer_list>.
+
+        <last_time> is the time of the last event already processed for these
+        customers, e.g. by application.process_event_history, or None if no
+        event was processed yet.
+        """
+        self.customers = customer_list
+        self._last_time = last_time
+
+    def get_last_time(self) -> Optional[str]:
+        """ Return the time of the last event processed, or None if no event
+        was processed yet.
+        """
+        return self._last_time
+
+    def ingest(self, events: Sequence[Dict]) -> None:
+        """ Process the calls from <events>, a batch of event dictionaries in
+        the format of the input dataset, after the events processed so far.
+
+        Raise a ValueError, without processing any event, if <events> is not
+        ordered chronologically or starts before the last event processed.
+
+        Preconditions:
+        - there is no "gap" month with zero activity for all customers
+        between the last event processed and <events>, or within <events>
+        - the customers already contain all the customers of <events>
+        """
+        previous = self._last_time
+        for event_data in events:
+            if previous is not None and event_data['time'] < previous:
+                raise ValueError("Out of order event at {}, after {}".format(
+                    event_data['time'], previous))
+            previous = event_data['time']
+        if not events:
+            return
+
+        process_events(events, self.customers, last_time=self._last_time)
+        self._last_time = previous
+
+    def ingest_log(self, log: Dict[str, List[Dict]]) -> None:
+        """ Process the calls from the events of the <log> dictionary, in the
+        format of the input dataset, like ingest.
+        """
+        self.ingest(log['events'])
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'customer', 'application'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,1008 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+Tests for the indexes and fast paths used when loading and querying large
+datasets. Each fast path is checked against the behaviour of the original,
+straightforward implementation.
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import csv
+import datetime
+import gzip
+import json
+import os
+import pickle
+import random
+import struct
+import subprocess
+import sys
+import pytest
+
+from application import create_customers, process_event_history, \
+    find_customer_by_number, import_customers, stream_event_history, \
+    process_events
+from eventstream import iter_json_array, parse_time, TIME_FORMAT
+from call import Call
+from callhistory import CallHistory
+from callstore import CallStore
+from contract import MTMContract
+from customer import Customer
+from phoneline import PhoneLine
+from registry import get_registry
+from filter import CustomerFilter, DurationFilter, LocationFilter, \
+    ResetFilter, _helper4, _helper5
+from callindex import CallList, GridIndex, DurationIndex, get_index, \
+    clear_index_cache
+from executor import FilterExecutor, SERIAL, THREAD, PROCESS, VECTOR
+from vectorfilter import apply_filters
+from benchmark import run_suite, compare_results
+from billing import generate_bills
+from sharding import process_events_sharded
+import callindex
+import snapshot
+from ingest import EventIngester
+from checkpoint import replay_events, resume_events
+import headless
+import billexport
+from datagen import DatasetGenerator, GeneratorConfig, write_dataset, \
+    write_customers, MAP_LOWER, MAP_UPPER
+from data import tiny_data
+from test_data import jan_data, com_data, customer as customer_data
+from sample_tests import test_dict as sample_dict
+
+# Datasets with both events and customers, spanning one or several months
+jan_log = {'events': jan_data['events'],
+           'customers': customer_data['customers']}
+com_log = {'events': com_data['events'],
+           'customers': customer_data['customers']}
+
+
+def random_calls(n, seed=148):
+    """ Return <n> random calls inside the Toronto map boundaries.
+    """
+    rng = random.Random(seed)
+    calls = []
+    for i in range(n):
+        src = (rng.uniform(-79.697878, -79.196382),
+               rng.uniform(43.576959, 43.799568))
+        dst = (rng.uniform(-79.697878, -79.196382),
+               rng.uniform(43.576959, 43.799568))
+        calls.append(Call('{0:03d}-{1:04d}'.format(i % 1000, i % 7),
+                          '{0:03d}-{1:04d}'.format(i % 997, i % 5),
+                          datetime.datetime(2018, 1 + i % 12, 1, 0, 0, 0),
+                          rng.randint(0, 600), src, dst))
+    return calls
+
+
+def all_bills(customers, months):
+    """ Return the bills of every customer in <customers> for each
+    (month, year) in <months>.
+    """
+    return [cust.generate_bill(month, year)
+            for cust in customers for month, year in months]
+
+
+def test_registry_built_by_create_customers() -> None:
+    """ Test that create_customers indexes every phone number to its customer
+    and line.
+    """
+    customers = create_customers(tiny_data)
+    registry = get_registry(customers)
+    assert len(registry) == 16
+    for cust in customers:
+        assert cust.get_registry() is registry
+        for line in cust.get_phone_lines():
+            assert registry.find(line.get_number()) == (cust, line)
+    assert registry.find('000-0000') is None
+    assert find_customer_by_number('731-0105', customers).get_id() == 5716
+    assert find_customer_by_number('000-0000', customers) is None
+
+    # The shared registry is found for the same customers in another order,
+    # and sublists are scanned without being attached to a registry
+    assert get_registry(customers[::-1]) is registry
+    assert get_registry(customers[1:]) is not registry
+    owner = find_customer_by_number('731-0105', customers)
+    others = [cust for cust in customers if cust is not owner]
+    assert find_customer_by_number('731-0105', [owner] + others) is owner
+    assert find_customer_by_number('731-0105', others) is None
+    assert find_customer_by_number('731-0105', others + [owner]) is owner
+
+    # Like the registry, the scan gives a number to its last owner
+    second = Customer(1)
+    second.add_phone_line(PhoneLine('731-0105',
+                                    MTMContract(datetime.date(2017, 12, 25))))
+    assert find_customer_by_number('731-0105', [owner, second]) is second
+    assert find_customer_by_number('731-0105', [second, owner]) is owner
+    customers.append(second)
+    assert not registry.covers(customers)
+    assert find_customer_by_number('731-0105', customers) is second
+
+
+def test_registry_tracks_ownership_changes() -> None:
+    """ Test that adding and cancelling lines updates the registry.
+    """
+    customers = create_customers(tiny_data)
+    registry = get_registry(customers)
+    customers[0].new_month(1, 2018)
+    number = customers[0].get_phone_numbers()[0]
+    assert customers[0].cancel_phone_line(number) is not None
+    assert number not in registry
+    assert find_customer_by_number(number, customers) is None
+
+    line = PhoneLine('555-0000', MTMContract(datetime.date(2017, 12, 25)))
+    customers[4].add_phone_line(line)
+    assert registry.find('555-0000') == (customers[4], line)
+
+
+def test_registry_for_unattached_customers() -> None:
+    """ Test that process_event_history works for customers that were not
+    created by create_customers.
+    """
+    customer = Customer(5555)
+    for line in create_customers(sample_dict)[0].get_phone_lines():
+        customer.add_phone_line(line)
+    assert customer.get_registry() is None
+    process_event_history(sample_dict, [customer])
+    bill = customer.generate_bill(1, 2018)
+    assert bill[2][1]['total'] == pytest.approx(50.05)
+
+
+def test_call_drawables_are_lazy_and_shared() -> None:
+    """ Test that call sprites are only created on request, and that calls
+    share the same loaded images.
+    """
+    loc1 = (-79.42848154284123, 43.641401675960374)
+    loc2 = (-79.52745693913239, 43.750338501653374)
+    time = datetime.datetime(2018, 1, 1, 1, 1, 1)
+    call1 = Call('867-5309', '273-8255', time, 10, loc1, loc2)
+    call2 = Call('273-8255', '867-5309', time, 20, loc2, loc1)
+    assert call1.drawables is None
+    assert call1.connection is None
+
+    drawables = call1.get_drawables()
+    assert drawables is call1.get_drawables()
+    assert [d.get_position() for d in drawables] == [loc1, loc2]
+    assert call1.get_connection().get_linelimits() == (loc1, loc2)
+    assert call2.get_drawables()[0].sprite is drawables[0].sprite
+    assert call2.get_drawables()[1].sprite is drawables[1].sprite
+    assert drawables[0].sprite is not drawables[1].sprite
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_iter_json_array(tmp_path, chunk_size) -> None:
+    """ Test that the chunked reader returns the same arrays as json.load,
+    regardless of where the chunks are split.
+    """
+    path = tmp_path / 'dataset.json'
+    path.write_text(json.dumps(com_log, indent=1))
+    for key in ['events', 'customers']:
+        assert list(iter_json_array(str(path), key, chunk_size)) == \
+            com_log[key]
+    assert list(iter_json_array(str(path), 'missing', chunk_size)) == []
+
+
+@pytest.mark.parametrize('log', [jan_log, com_log, sample_dict])
+def test_stream_event_history(tmp_path, log) -> None:
+    """ Test that streaming the events from a JSON or NDJSON file produces
+    the same bills as process_event_history.
+    """
+    months = [(1, 2018), (2, 2018), (3, 2018), (4, 2018)]
+    expected_customers = create_customers(log)
+    process_event_history(log, expected_customers)
+    expected = all_bills(expected_customers, months)
+
+    json_path = tmp_path / 'dataset.json'
+    json_path.write_text(json.dumps(log))
+    customers = create_customers(import_customers(str(json_path)))
+    stream_event_history(str(json_path), customers)
+    assert all_bills(customers, months) == expected
+
+    ndjson_path = tmp_path / 'events.ndjson'
+    ndjson_path.write_text(''.join(json.dumps(event) + '\n'
+                                   for event in log['events']))
+    customers = create_customers(log)
+    stream_event_history(str(ndjson_path), customers)
+    assert all_bills(customers, months) == expected
+
+
+def test_parse_time() -> None:
+    """ Test that parse_time agrees with strptime, and rejects timestamps
+    that strptime rejects.
+    """
+    for text in ['2018-01-01 14:29:05', '2019-12-31 23:59:59',
+                 '2018-02-28 00:00:00']:
+        assert parse_time(text) == datetime.datetime.strptime(text,
+                                                              TIME_FORMAT)
+    for text in ['2018-02-30 00:00:00', '2018-01-01', 'not a timestamp!!!!']:
+        with pytest.raises(ValueError):
+            parse_time(text)
+
+
+def test_customer_line_lookup() -> None:
+    """ Test that a customer dispatches calls and lookups to the right line,
+    while keeping its phone numbers in order.
+    """
+    customer = Customer(1234)
+    numbers = ['{0:03d}-0000'.format(i) for i in range(200)]
+    for number in numbers:
+        customer.add_phone_line(
+            PhoneLine(number, MTMContract(datetime.date(2017, 12, 25))))
+    customer.new_month(1, 2018)
+    loc = (-79.42848154284123, 43.641401675960374)
+    call = Call(numbers[150], numbers[3],
+                datetime.datetime(2018, 1, 5, 10, 0, 0), 61, loc, loc)
+    customer.make_call(call)
+    customer.receive_call(call)
+
+    assert customer.get_phone_numbers() == numbers
+    assert numbers[150] in customer and '999-9999' not in customer
+    assert customer.get_call_history('999-9999') == []
+    history = customer.get_call_history(numbers[150])
+    assert len(history) == 1
+    assert history[0].get_monthly_history(1, 2018) == ([call], [])
+    assert customer.get_call_history(numbers[3])[0].get_monthly_history() == \
+        ([], [call])
+    assert customer.generate_bill(1, 2018)[1] == pytest.approx(200 * 50 + 0.1)
+
+    # An equal number that is a different string object is still found
+    assert customer.cancel_phone_line(''.join(list(numbers[150]))) == \
+        pytest.approx(50.1)
+    assert customer.cancel_phone_line(numbers[150]) is None
+    assert customer.get_phone_numbers() == numbers[:150] + numbers[151:]
+
+
+def test_customer_filter_order_and_duplicates() -> None:
+    """ Test that the customer filter keeps the order of <data>, drops
+    repeated calls and ignores unknown customers.
+    """
+    customers = create_customers(com_log)
+    process_event_history(com_log, customers)
+    calls = []
+    for cust in customers:
+        calls.extend(cust.get_history()[0])
+    data = list(reversed(calls)) + calls
+
+    result = CustomerFilter().apply(customers, data, '5716')
+    owner = find_customer_by_number('422-4785', customers)
+    expected = [c for c in reversed(calls)
+                if c.src_number in owner or c.dst_number in owner]
+    assert result == expected
+    assert len(result) == 3
+    assert CustomerFilter().apply(customers, data, '1111') is data
+
+
+def test_grid_index_matches_scan() -> None:
+    """ Test that rectangle queries through a GridIndex return the same
+    calls, in the same order, as scanning every call.
+    """
+    calls = random_calls(3000)
+    index = GridIndex(calls)
+    rng = random.Random(7)
+    rectangles = [[-79.697878, 43.576959, -79.196382, 43.799568],
+                  [-79.5, 43.6, -79.5, 43.6],
+                  [calls[0].src_loc[0], calls[0].src_loc[1],
+                   calls[0].src_loc[0], calls[0].src_loc[1]],
+                  [-80.5, 43.0, -79.5, 43.7],
+                  [-79.3, 43.7, -78.0, 44.5],
+                  [-81.0, 42.0, -80.0, 43.0]]
+    for _ in range(50):
+        longs = sorted(rng.uniform(-79.697878, -79.196382) for _ in range(2))
+        lats = sorted(rng.uniform(43.576959, 43.799568) for _ in range(2))
+        rectangles.append([longs[0], lats[0], longs[1], lats[1]])
+    for rect in rectangles:
+        expected = []
+        _helper5(calls, rect, expected)
+        assert index.query(*rect) == expected
+    assert calls[0] in index.query(*rectangles[2])
+    assert GridIndex([]).query(*rectangles[0]) == []
+
+
+def test_index_cache_invalidation() -> None:
+    """ Test that cached indexes are reused for the same call list at the
+    same version, and rebuilt when the list or its version changes.
+    """
+    calls = CallList(random_calls(50))
+    index = get_index('location', calls, GridIndex)
+    assert get_index('location', calls, GridIndex) is index
+    assert get_index('location', CallList(calls), GridIndex) is not index
+    index = get_index('location', calls, GridIndex)
+    calls.append(random_calls(1, seed=1)[0])
+    calls.version += 1
+    assert get_index('location', calls, GridIndex) is not index
+
+
+def test_index_cache_detects_replaced_calls() -> None:
+    """ Test that only call lists are indexed, and that replacing a call in
+    the middle of a call list, at a new version, invalidates the cached
+    duration and location indexes.
+    """
+    calls = CallList(random_calls(2000))
+    customers = []
+    rect = '-79.6, 43.6, -79.3, 43.75'
+    clear_index_cache()
+    DurationFilter().apply(customers, list(calls), 'G50')
+    LocationFilter().apply(customers, list(calls), rect)
+    assert not callindex._index_cache
+    for _ in range(2):
+        assert DurationFilter().apply(customers, calls, 'G50') == \
+            [call for call in calls if call.duration > 50]
+        expected = []
+        _helper5(calls, [float(x) for x in rect.split(', ')], expected)
+        assert LocationFilter().apply(customers, calls, rect) == expected
+        replacement = random_calls(1, seed=3)[0]
+        replacement.duration = 100 if calls[500].duration <= 50 else 10
+        replacement.src_loc = (-79.5, 43.7) \
+            if calls[500] not in expected else (-80.0, 44.0)
+        replacement.dst_loc = replacement.src_loc
+        calls[500] = replacement
+        calls.version += 1
+
+
+def test_duration_index_matches_scan() -> None:
+    """ Test that duration queries through a DurationIndex, and the duration
+    filter on a large call set, return the same calls as scanning.
+    """
+    calls = CallList(random_calls(2000))
+    index = DurationIndex(calls)
+    for duration in [0, 1, 59, 300, 599, 600, 1000]:
+        for letter, query in [('L', index.shorter_than),
+                              ('G', index.longer_than)]:
+            expected = []
+            _helper4(letter, calls, expected, duration)
+            assert query(duration) == expected
+            assert DurationFilter().apply([], calls, letter + str(duration)) \
+                == expected
+
+
+def test_duration_filter_sees_changed_call_set() -> None:
+    """ Test that the duration filter does not reuse an index built for a
+    call set that has changed since.
+    """
+    calls = CallList(random_calls(1500))
+    before = DurationFilter().apply([], calls, 'G100')
+    extra = random_calls(1, seed=3)[0]
+    extra.duration = 5000
+    calls.append(extra)
+    calls.version += 1
+    after = DurationFilter().apply([], calls, 'G100')
+    assert after == before + [extra]
+
+
+def test_vector_filters_match_apply() -> None:
+    """ Test that chains of filters evaluated as masks give the same calls,
+    in the same order, as applying the filters one after the other, for calls
+    in a call store and for calls that are not.
+    """
+    customers = create_customers(com_log)
+    process_event_history(com_log, customers)
+    stored = ResetFilter().apply(customers, [], '')
+    ids = [str(cust.get_id()) for cust in customers]
+    strings = [(DurationFilter(), 'L60'), (DurationFilter(), 'G60'),
+               (DurationFilter(), 'G-5'), (DurationFilter(), 'X'),
+               (LocationFilter(), '-79.6, 43.6, -79.3, 43.7'),
+               (LocationFilter(), '-79.5, 43.6, -79.9, 43.7'),
+               (CustomerFilter(), ids[0]), (CustomerFilter(), ids[-1]),
+               (CustomerFilter(), '123456789'), (CustomerFilter(), 'x')]
+    rng = random.Random(148)
+    for data in [stored, stored + stored[:40], random_calls(2000)]:
+        for _ in range(60):
+            chain = rng.sample(strings, rng.randint(1, 3))
+            expected = data
+            for f, filter_string in chain:
+                expected = f.apply(customers, expected, filter_string)
+            result = apply_filters(customers, data, chain)
+            assert len(result) == len(expected)
+            assert all(a is b for a, b in zip(result, expected))
+
+
+@pytest.mark.parametrize('mode', [SERIAL, THREAD, PROCESS, VECTOR])
+def test_filter_executor(mode) -> None:
+    """ Test that applying filters through every executor mode gives the
+    same calls, in the same order, as applying them directly.
+    """
+    customers = create_customers(com_log)
+    process_event_history(com_log, customers)
+    executor = FilterExecutor(mode, 3)
+    # Small call sets are split into chunks; large ones use the indexes
+    for calls in [random_calls(500), random_calls(3000)]:
+        for f, filter_string in [(DurationFilter(), 'L300'),
+                                 (DurationFilter(), 'G300'),
+                                 (DurationFilter(), 'nonsense'),
+                                 (LocationFilter(),
+                                  '-79.6, 43.6, -79.3, 43.7'),
+                                 (CustomerFilter(), '9999')]:
+            assert executor.apply(f, customers, calls, filter_string) == \
+                f.apply(customers, calls, filter_string)
+        assert executor.apply(ResetFilter(), customers, calls, '') == \
+            ResetFilter().apply(customers, calls, '')
+    executor.close()
+
+
+@pytest.mark.parametrize('mode', [THREAD, PROCESS])
+def test_executor_merges_chunks_of_stored_calls(mode) -> None:
+    """ Test that stored calls, repeated across chunks, are filtered in the
+    pool of the executor like applying the filters directly, and that the
+    pool is kept until the executor is closed.
+    """
+    customers = create_customers(com_log)
+    process_event_history(com_log, customers)
+    calls = []
+    for cust in customers:
+        calls.extend(cust.get_history()[0])
+    data = list(reversed(calls)) + calls
+    executor = FilterExecutor(mode, 3)
+    for f, filter_string in [(CustomerFilter(), '5716'),
+                             (DurationFilter(), 'G60'),
+                             (LocationFilter(), '-79.6, 43.6, -79.3, 43.7')]:
+        assert executor.apply(f, customers, data, filter_string) == \
+            f.apply(customers, data, filter_string)
+    pool = executor._pool
+    assert pool is not None
+    executor.apply(DurationFilter(), customers, data, 'L60')
+    assert executor._pool is pool
+    executor.close()
+    assert executor._pool is None
+
+
+@pytest.mark.parametrize('mode', [THREAD, PROCESS])
+def test_executor_reuses_whole_list_index(mode) -> None:
+    """ Test that the executor queries the cached index of the whole call
+    list, instead of building an index for every chunk.
+    """
+    calls = CallList(random_calls(3000))
+    executor = FilterExecutor(mode, 3)
+    for rect in ['-79.6, 43.6, -79.3, 43.7', '-79.5, 43.6, -79.4, 43.7']:
+        executor.apply(LocationFilter(), [], calls, rect)
+        index = get_index('location', calls, lambda data: None)
+        assert isinstance(index, GridIndex) and index.data is calls
+    executor.close()
+
+
+def test_benchmark_suite_output() -> None:
+    """ Test that the benchmark suite reports every stage for every size,
+    and that slower timings are reported as regressions.
+    """
+    results = run_suite([100, 300], repeat=1, render=False)
+    json.dumps(results)
+    names = {(r['benchmark'], r['events']) for r in results['results']}
+    for size in [100, 300]:
+        for name in ['create_customers', 'process_event_history',
+                     'filter.duration', 'filter.location', 'filter.customer',
+                     'filter.reset', 'generate_bill']:
+            assert (name, size) in names
+
+    slower = {'results': [dict(r, seconds=r['seconds'] * 2 + 1)
+                          for r in results['results']]}
+    assert compare_results(results, results) == []
+    assert len(compare_results(results, slower)) == len(results['results'])
+
+
+def test_dataset_generator(tmp_path) -> None:
+    """ Test that generated datasets follow the input format, are
+    reproducible from their seed, and bill the same from JSON and NDJSON.
+    """
+    config = GeneratorConfig(customers=30, min_lines=1, max_lines=4,
+                             contract_mix={'mtm': 1, 'prepaid': 2},
+                             events=2000, call_ratio=0.7, hotspots=3,
+                             start_year=2018, start_month=11, months=4,
+                             seed=5)
+    json_path = tmp_path / 'dataset.json'
+    with open(str(json_path), 'w') as out:
+        write_dataset(DatasetGenerator(config), out)
+    log = json.loads(json_path.read_text())
+    assert log == DatasetGenerator(config).dataset()
+    generator = DatasetGenerator(config)
+    assert generator.customers() == generator.customers() == log['customers']
+    assert list(generator.events()) == log['events']
+    assert len(log['customers']) == 30
+    assert len(log['events']) == 2000
+
+    times = [event['time'] for event in log['events']]
+    assert times == sorted(times)
+    assert {t[:7] for t in times} == {'2018-11', '2018-12', '2019-01',
+                                      '2019-02'}
+    for event in log['events']:
+        assert ('duration' in event) == (event['type'] == 'call')
+        for loc in (event['src_loc'], event['dst_loc']):
+            assert MAP_LOWER[0] <= loc[0] <= MAP_UPPER[0]
+            assert MAP_LOWER[1] <= loc[1] <= MAP_UPPER[1]
+    contracts = {line['contract'] for cust in log['customers']
+                 for line in cust['lines']}
+    assert contracts == {'mtm', 'prepaid'}
+
+    ndjson_path = tmp_path / 'events.ndjson'
+    customers_path = tmp_path / 'customers.json'
+    with open(str(ndjson_path), 'w') as out:
+        write_dataset(DatasetGenerator(config), out, ndjson=True)
+    with open(str(customers_path), 'w') as out:
+        write_customers(DatasetGenerator(config), out)
+    months = [(11, 2018), (12, 2018), (1, 2019), (2, 2019)]
+    expected = create_customers(log)
+    process_event_history(log, expected)
+    customers = create_customers(import_customers(str(customers_path)))
+    stream_event_history(str(ndjson_path), customers)
+    assert all_bills(customers, months) == all_bills(expected, months)
+
+
+def test_call_is_compact() -> None:
+    """ Test that calls have no instance dictionary, and share the strings
+    of equal phone numbers.
+    """
+    loc = (-79.42848154284123, 43.641401675960374)
+    time = datetime.datetime(2018, 1, 1, 1, 1, 1)
+    call1 = Call(''.join(['867', '-5309']), '273-8255', time, 10, loc, loc)
+    call2 = Call(''.join(['867-', '5309']), '273-8255', time, 10, loc, loc)
+    assert not hasattr(call1, '__dict__')
+    assert call1.src_number is call2.src_number
+    assert call1.get_bill_date() == (1, 2018)
+
+
+
+def test_call_store_rows() -> None:
+    """ Test that a call registered in two call histories is stored once, and
+    that calls rebuilt from the store are the same as the original ones.
+    """
+    store = CallStore()
+    src, dst = CallHistory(store), CallHistory(store)
+    calls = random_calls(50)
+    for call in calls:
+        src.register_outgoing_call(call)
+        dst.register_incoming_call(call)
+    assert len(store) == 50
+    assert [store.get_row(call) for call in calls] == list(range(50))
+    assert store.get_row(random_calls(1, seed=3)[0]) is None
+    assert sorted(src.get_monthly_rows()[0]) == list(range(50))
+    assert dst.get_monthly_rows()[0] == []
+    assert dst.get_monthly_history(1, 2018)[1] == \
+        [call for call in calls if call.time.month == 1]
+    for call in dst.get_monthly_history()[1]:
+        assert call in calls
+
+    expected = [(c.src_number, c.dst_number, c.time, c.duration, c.src_loc,
+                 c.dst_loc) for c in calls]
+    del calls, call
+    rebuilt = store.get_calls(range(50))
+    assert [(c.src_number, c.dst_number, c.time, c.duration, c.src_loc,
+             c.dst_loc) for c in rebuilt] == expected
+    assert rebuilt[0] is src.get_monthly_history(1, 2018)[0][0]
+    with pytest.warns(DeprecationWarning):
+        assert src.outgoing_calls[(1, 2018)][0] is rebuilt[0]
+
+
+def test_call_store_per_customer_set() -> None:
+    """ Test that every set of customers keeps its calls in its own
+    CallStore, which does not grow when another set is processed.
+    """
+    stores = []
+    for _ in range(2):
+        customers = create_customers(com_log)
+        process_event_history(com_log, customers)
+        store = customers[0].get_call_history()[0].get_store()
+        assert all(history.get_store() is store for cust in customers
+                   for history in cust.get_call_history())
+        stores.append(store)
+    assert stores[0] is not stores[1]
+    assert len(stores[0]) == len(stores[1]) > 0
+
+
+def test_history_iterators() -> None:
+    """ Test that the history iterators give the same calls, in the same
+    order, as the history lists, without building lists.
+    """
+    customers = create_customers(com_log)
+    process_event_history(com_log, customers)
+    for cust in customers:
+        outgoing, incoming = cust.iter_history()
+        assert not isinstance(outgoing, list)
+        assert (list(outgoing), list(incoming)) == cust.get_history()
+        for line in cust.get_phone_lines():
+            for month, year in [(1, 2018), (2, 2018), (12, 2017)]:
+                outgoing, incoming = line.iter_monthly_history(month, year)
+                assert (list(outgoing), list(incoming)) == \
+                    line.get_monthly_history(month, year)
+    assert ResetFilter().apply(customers, [], '') == \
+        [call for cust in customers for call in cust.get_history()[0]]
+
+def test_all_calls_view(monkeypatch) -> None:
+    """ Test that the all-calls lists returned by ResetFilter and customers
+    are kept up to date as calls are made and lines are cancelled, in the
+    order of the customers, their lines and months, whenever they were first
+    built.
+    """
+    customers = create_customers(jan_log)
+    assert ResetFilter().apply(customers, [], '') == []
+    assert customers[0].get_outgoing_calls() == []
+    process_event_history(jan_log, customers)
+    reset = ResetFilter().apply(customers, [], '')
+    assert ResetFilter().apply(customers, [], '') is reset
+    walked = [call for cust in customers for call in cust.get_history()[0]]
+    assert reset == walked
+    own = customers[0].get_outgoing_calls()
+    assert own == customers[0].get_history()[0]
+    assert customers[0].get_outgoing_calls() is own
+
+    built_after = create_customers(jan_log)
+    process_event_history(jan_log, built_after)
+    assert [(c.src_number, c.time) for c in reset] == \
+        [(c.src_number, c.time)
+         for c in ResetFilter().apply(built_after, [], '')]
+
+    # A new call of the last month is appended to the segment of its
+    # history, without gathering the calls of any history again
+    src, dst = customers[1].get_phone_numbers()[0], \
+        customers[2].get_phone_numbers()[0]
+    history = customers[1].get_call_history(src)[0]
+    loc = (-79.42848154284123, 43.641401675960374)
+    late = Call(src, dst, datetime.datetime(2018, 1, 31, 23, 0), 60, loc, loc)
+    early = Call(src, dst, datetime.datetime(2017, 12, 1), 60, loc, loc)
+    customers[1].get_outgoing_calls()
+    version = reset.version
+    monkeypatch.setattr(CallHistory, 'iter_monthly_history', None)
+    history.register_outgoing_call(late)
+    assert ResetFilter().apply(customers, [], '') is reset
+    assert isinstance(reset, CallList) and reset.version > version
+    assert late in customers[1].get_outgoing_calls()
+    monkeypatch.undo()
+    assert reset == [call for cust in customers
+                     for call in cust.get_history()[0]]
+    # A call of an earlier month is not, but the order is kept
+    history.register_outgoing_call(early)
+    assert ResetFilter().apply(customers, [], '') == \
+        [call for cust in customers for call in cust.get_history()[0]]
+
+    number = customers[0].get_phone_numbers()[0]
+    customers[0].cancel_phone_line(number)
+    reset = ResetFilter().apply(customers, [], '')
+    assert all(call.src_number != number for call in reset)
+    assert len(reset) == \
+        sum(len(cust.get_history()[0]) for cust in customers)
+    assert customers[0].get_outgoing_calls() == customers[0].get_history()[0]
+    # customer lists that are not attached to one registry are walked
+    assert ResetFilter().apply(customers[:2], [], '') == \
+        [call for cust in customers[:2] for call in cust.get_history()[0]]
+
+
+def _bill_states(customers):
+    """ Return every bill summary and contract balance of <customers>.
+    """
+    states = []
+    for cust in customers:
+        for line in cust.get_phone_lines():
+            states.append((line.get_number(),
+                           sorted((key, bill.get_summary())
+                                  for key, bill in line.bills.items()),
+                           getattr(line.contract, 'balance', None)))
+    return states
+
+
+@pytest.mark.parametrize('log', [com_log, 'generated'])
+def test_batch_billing_matches_incremental(log) -> None:
+    """ Test that billing a month at a time gives the same bills as billing
+    every call as it is made, including the prepaid balances carried over
+    from one month to the next.
+    """
+    if log == 'generated':
+        config = GeneratorConfig(customers=30, max_lines=3, events=3000,
+                                 seed=7)
+        log = DatasetGenerator(config).dataset()
+    incremental = create_customers(log)
+    process_event_history(log, incremental)
+    batch = create_customers(log)
+    process_event_history(log, batch, batch_billing=True)
+    assert _bill_states(batch) == _bill_states(incremental)
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_generate_bills(workers) -> None:
+    """ Test that the month-end billing gives the bill of every customer, in
+    increasing order of customer id, with any number of workers.
+    """
+    customers = create_customers(com_log)
+    process_event_history(com_log, customers)
+    shuffled = list(customers)
+    random.Random(1).shuffle(shuffled)
+    for month, year in [(1, 2018), (2, 2018), (3, 2018)]:
+        expected = sorted((cust.generate_bill(month, year)
+                           for cust in customers), key=lambda b: b[0])
+        assert generate_bills(shuffled, month, year, workers) == expected
+
+def _history_states(customers):
+    """ Return the calls of every call history of <customers>, by month.
+    """
+    def fields(calls):
+        return sorted(((c.src_number, c.dst_number, c.time, c.duration,
+                        c.src_loc, c.dst_loc) for c in calls),
+                      key=lambda f: (f[2].year, f[2].month))
+    return [(line.get_number(),
+             fields(line.callhistory.iter_monthly_history()[0]),
+             fields(line.callhistory.iter_monthly_history()[1]))
+            for cust in customers for line in cust.get_phone_lines()]
+
+
+@pytest.mark.parametrize('batches', [1, 4, 25])
+def test_incremental_ingestion(batches) -> None:
+    """ Test that ingesting the events in batches, split in the middle of
+    months, gives the same bills, prepaid balances and call histories as
+    processing them at once, and that out of order batches, or batch billing
+    after earlier events, are rejected.
+    """
+    config = GeneratorConfig(customers=20, max_lines=3, events=2000, seed=5)
+    log = DatasetGenerator(config).dataset()
+    expected = create_customers(log)
+    process_event_history(log, expected)
+
+    customers = create_customers(log)
+    size = len(log['events']) // batches + 1
+    first = log['events'][:size]
+    process_events(first, customers)
+    ingester = EventIngester(customers, first[-1]['time'])
+    for start in range(size, len(log['events']), size):
+        ingester.ingest(log['events'][start:start + size])
+    ingester.ingest([])
+    assert ingester.get_last_time() == log['events'][-1]['time']
+    assert _bill_states(customers) == _bill_states(expected)
+    assert _history_states(customers) == _history_states(expected)
+
+    with pytest.raises(ValueError):
+        ingester.ingest(log['events'][-1:] + log['events'][:1])
+    with pytest.raises(ValueError):
+        process_events(log['events'][-1:], customers, batch_billing=True,
+                       last_time=ingester.get_last_time())
+    assert _bill_states(customers) == _bill_states(expected)
+
+
+@pytest.mark.parametrize('months', [1, 2])
+def test_checkpoint_resume(tmp_path, months) -> None:
+    """ Test that a replay interrupted in the middle of a month resumes from
+    its last checkpoint, and gives the same bills, prepaid balances and call
+    histories as a replay that was never interrupted.
+    """
+    config = GeneratorConfig(customers=20, max_lines=3, events=3000,
+                             months=6, seed=9)
+    log = DatasetGenerator(config).dataset()
+    expected = create_customers(log)
+    process_event_history(log, expected)
+    filename = str(tmp_path / 'replay.checkpoint')
+
+    crash = len(log['events']) // 2 + 100
+
+    def interrupted():
+        for i, event_data in enumerate(log['events']):
+            if i == crash:
+                raise RuntimeError("crash")
+            yield event_data
+
+    with pytest.raises(RuntimeError):
+        replay_events(interrupted(), create_customers(log), filename, months)
+    offset = snapshot.read_snapshot(filename)[1]['offset']
+    assert 0 < offset < crash
+    assert log['events'][offset]['time'][5:7] != \
+        log['events'][offset - 1]['time'][5:7]
+
+    resumed = resume_events(iter(log['events']), filename, months)
+    assert _bill_states(resumed) == _bill_states(expected)
+    assert _history_states(resumed) == _history_states(expected)
+    assert snapshot.read_snapshot(filename)[1]['offset'] > crash
+
+
+def _gui_modules(script):
+    """ Return the pygame and tkinter modules imported by the Python code
+    <script>, run in a new interpreter.
+    """
+    script += ('\nimport sys\nprint(sorted(name for name in sys.modules '
+               'if name.split(".")[0] in ("pygame", "tkinter")))')
+    result = subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=os.path.dirname(os.path.abspath(headless.__file__)),
+        stdout=subprocess.PIPE, check=True, universal_newlines=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def test_model_imports_without_user_interface() -> None:
+    """ Test that the model, filter and billing modules do not import pygame
+    or tkinter, and that pygame is imported once a call is drawn.
+    """
+    assert _gui_modules(
+        'import call, customer, phoneline, contract, filter, executor, '
+        'application, billing, sharding, ingest, checkpoint, snapshot') == '[]'
+    drawn = _gui_modules(
+        'import datetime\nfrom call import Call\n'
+        'Call("1", "2", datetime.datetime(2018, 1, 1), 60, (-79.5, 43.7), '
+        '(-79.4, 43.6)).get_drawables()')
+    assert "'pygame'" in drawn and 'tkinter' not in drawn
+
+
+def test_headless_billing(tmp_path) -> None:
+    """ Test that the headless mode writes the bills of every customer for a
+    range of months, as CSV and JSON, without importing the user interface.
+    """
+    dataset = str(tmp_path / 'dataset.json')
+    with open(dataset, 'w') as f:
+        json.dump(com_log, f)
+    customers = create_customers(com_log)
+    process_event_history(com_log, customers)
+    months = headless.billed_months(customers, (2, 2018), (3, 2018))
+    assert months == [(2, 2018), (3, 2018)]
+
+    output = str(tmp_path / 'bills.json')
+    assert headless.main(['--dataset', dataset, '--start', '2018-02',
+                          '--end', '2018-03', '--format', 'json',
+                          '--output', output]) == 0
+    with open(output) as f:
+        bills = json.load(f)
+    assert [(b['month'], b['year'], b['customer'], b['total'], b['lines'])
+            for b in bills] == [(month, year) + bill for month, year in months
+                                for bill in generate_bills(customers, month,
+                                                           year)]
+
+    output = str(tmp_path / 'bills.csv')
+    assert _gui_modules('import headless\nheadless.main({!r})'.format(
+        ['--dataset', dataset, '--output', output])) == '[]'
+    with open(output, newline='') as f:
+        rows = list(csv.DictReader(f))
+    bills = [bill for month, year in headless.billed_months(customers)
+             for bill in generate_bills(customers, month, year)]
+    assert len(rows) == sum(len(bill[2]) + 1 for bill in bills if bill[2])
+
+    # NDJSON events need the customers from another file
+    events = str(tmp_path / 'events.ndjson')
+    with open(events, 'w') as f:
+        for event in com_log['events']:
+            f.write(json.dumps(event) + '\n')
+    assert headless.main(['--dataset', events, '--output', output]) == 1
+    assert headless.main(['--dataset', events, '--customers', events,
+                          '--output', output]) == 1
+    assert headless.main(['--dataset', events, '--customers', dataset,
+                          '--output', output]) == 0
+    with open(output, newline='') as f:
+        assert len(list(csv.DictReader(f))) == len(rows)
+
+
+@pytest.mark.parametrize('export_format', ['csv', 'ndjson'])
+@pytest.mark.parametrize('compress', [False, True])
+def test_bill_export(tmp_path, export_format, compress) -> None:
+    """ Test that the bill export writes a row for every phone line bill and
+    a row with the totals of every customer bill, optionally compressed.
+    """
+    customers = create_customers(com_log)
+    process_event_history(com_log, customers)
+    months = headless.billed_months(customers)
+    filename = str(tmp_path / ('bills.' + export_format))
+    count = billexport.export_bills(filename, customers, months,
+                                    export_format, compress)
+
+    opener = gzip.open if compress else open
+    with opener(filename, 'rt', newline='') as f:
+        if export_format == 'csv':
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f]
+    assert len(rows) == count
+
+    expected = []
+    for month, year in months:
+        for cust_id, total, lines in generate_bills(customers, month, year):
+            if lines:
+                expected.extend((month, year, cust_id, line['number'],
+                                 line['total']) for line in lines)
+                expected.append((month, year, cust_id, '', total))
+    assert [(int(row['month']), int(row['year']), int(row['customer']),
+             row['number'] if row['kind'] == 'line' else '',
+             pytest.approx(float(row['total']))) for row in rows] == expected
+
+    with pytest.raises(ValueError):
+        billexport.export_bills(str(tmp_path / 'bills.xml'), customers,
+                                months, 'xml')
+    assert not os.path.exists(str(tmp_path / 'bills.xml'))
+
+
+@pytest.mark.parametrize('shards', [2, 3])
+def test_sharded_ingestion_matches_sequential(shards) -> None:
+    """ Test that processing the events in shards gives the same bills,
+    prepaid balances and call histories as processing them sequentially,
+    with every call shared by the histories of both of its numbers.
+    """
+    config = GeneratorConfig(customers=20, max_lines=3, events=2000, seed=3)
+    log = DatasetGenerator(config).dataset()
+    sequential = create_customers(log)
+    process_event_history(log, sequential)
+    sharded = create_customers(log)
+    process_events_sharded(log['events'], sharded, shards)
+    assert _bill_states(sharded) == _bill_states(sequential)
+    assert _history_states(sharded) == _history_states(sequential)
+
+    reset = ResetFilter().apply(sharded, [], '')
+    for cust in sharded:
+        outgoing, incoming = cust.get_history()
+        assert all(call in reset for call in incoming
+                   if call.src_number in get_registry(sharded))
+        assert len(CustomerFilter().apply(sharded, reset,
+                                          str(cust.get_id()))) == \
+            len(set(outgoing) | {call for call in incoming
+                                 if call.src_number in get_registry(sharded)})
+
+def test_snapshot_round_trip(tmp_path, monkeypatch) -> None:
+    """ Test that a snapshot restores the bills and call histories of the
+    customers, can be processed further, and is rejected once stale.
+    """
+    dataset = tmp_path / 'dataset.json'
+    with open(dataset, 'w') as f:
+        json.dump(com_log, f)
+    customers = create_customers(com_log)
+    process_event_history(com_log, customers)
+    filename = str(tmp_path / 'customers.snapshot')
+    snapshot.save_snapshot(filename, customers, str(dataset))
+
+    loaded = snapshot.load_snapshot(filename, str(dataset))
+    assert _bill_states(loaded) == _bill_states(customers)
+    assert _history_states(loaded) == _history_states(customers)
+    assert len(ResetFilter().apply(loaded, [], '')) == \
+        len(ResetFilter().apply(customers, [], ''))
+    extra = {'type': 'call', 'src_number': com_log['events'][0]['src_number'],
+             'dst_number': com_log['events'][0]['dst_number'],
+             'time': '2018-03-31 23:00:00', 'duration': 120,
+             'src_loc': [-79.5, 43.7], 'dst_loc': [-79.4, 43.6]}
+    process_event_history({'events': [extra]}, customers)
+    process_event_history({'events': [extra]}, loaded)
+    assert _bill_states(loaded) == _bill_states(customers)
+
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_VERSION',
+                        snapshot.SNAPSHOT_VERSION + 1)
+    with pytest.raises(ValueError):
+        snapshot.load_snapshot(filename)
+    monkeypatch.undo()
+    with open(dataset, 'a') as f:
+        f.write('\n')
+    with pytest.raises(ValueError):
+        snapshot.load_snapshot(filename, str(dataset))
+
+    # A snapshot written before the header kept a state
+    old_format = str(tmp_path / 'old.snapshot')
+    with open(old_format, 'wb') as f:
+        f.write(snapshot.MAGIC + struct.pack('<I', 1))
+        pickle.dump({'source': None, 'customers': 0}, f)
+        pickle.dump([], f)
+        pickle.dump([], f)
+    with pytest.raises(ValueError):
+        snapshot.read_snapshot(old_format)
+
+    # Truncated snapshots
+    with open(filename, 'rb') as f:
+        contents = f.read()
+    for size in [len(snapshot.MAGIC) + 2, len(contents) // 2,
+                 len(contents) - 1]:
+        with open(filename, 'wb') as f:
+            f.write(contents[:size])
+        with pytest.raises(ValueError):
+            snapshot.load_snapshot(filename)
+
+
+def test_filters_on_rebuilt_calls() -> None:
+    """ Test that filtering calls rebuilt from the call store gives the same
+    calls as filtering the calls created while processing the events.
+    """
+    customers = create_customers(jan_log)
+    process_event_history(jan_log, customers)
+    calls = []
+    for cust in customers:
+        calls.extend(cust.get_history()[0])
+    expected = [(c.src_number, c.time) for c in
+                DurationFilter().apply(customers, calls, 'G60')]
+    del calls
+    calls = []
+    for cust in customers:
+        calls.extend(cust.get_history()[0])
+    assert [(c.src_number, c.time) for c in
+            DurationFilter().apply(customers, calls, 'G60')] == expected
+
+
+if __name__ == '__main__':
+    pytest.main(['perf_tests.py'])
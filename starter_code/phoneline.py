@@ -11,9 +11,10 @@ any changes, are expressly prohibited.
 All of the files in this directory and all subdirectories are:
 Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
-from typing import List, Dict, Tuple, Optional, Union
+from typing import List, Dict, Iterator, Tuple, Optional, Union
 from call import Call
 from callhistory import CallHistory
+from callstore import CallStore
 from bill import Bill
 from contract import Contract
 
@@ -42,12 +43,15 @@ class PhoneLine:
     bills: Dict[Tuple[int, int], Bill]
     callhistory: CallHistory
 
-    def __init__(self, number: str, contract: Contract) -> None:
-        """ Create a new PhoneLine with <number> and <contract>.
+    def __init__(self, number: str, contract: Contract,
+                 store: Optional[CallStore] = None) -> None:
+        """ Create a new PhoneLine with <number> and <contract>. The calls of
+        its call history are kept in <store>, or in a new CallStore if <store>
+        is None.
         """
         self.number = number
         self.contract = contract
-        self.callhistory = CallHistory()
+        self.callhistory = CallHistory(store)
         self.bills = {}
 
     def new_month(self, month: int, year: int) -> None:
@@ -67,8 +71,7 @@ class PhoneLine:
         month must be <started> by advancing to the right month from <call>.
         """
         self.callhistory.register_outgoing_call(call)
-        if (call.time.month, call.time.year) not in self.bills:
-            self.new_month(call.time.month, call.time.year)
+        self.ensure_bill(call.time.month, call.time.year)
         self.contract.bill_call(call)
 
     def receive_call(self, call: Call) -> None:
@@ -79,8 +82,14 @@ class PhoneLine:
         <call>.
         """
         self.callhistory.register_incoming_call(call)
-        if (call.time.month, call.time.year) not in self.bills:
-            self.new_month(call.time.month, call.time.year)
+        self.ensure_bill(call.time.month, call.time.year)
+
+    def ensure_bill(self, month: int, year: int) -> None:
+        """ Advance to the <month> and <year> billing cycle, if there is no
+        bill for it yet.
+        """
+        if (month, year) not in self.bills:
+            self.new_month(month, year)
 
     def cancel_line(self) -> float:
         """ Cancel this line's contract and return the outstanding bill amount
@@ -119,6 +128,13 @@ class PhoneLine:
         """
         return self.callhistory.get_monthly_history(month, year)
 
+    def iter_monthly_history(self, month: int = None, year: int = None) -> \
+            Tuple[Iterator[Call], Iterator[Call]]:
+        """ Return iterators over the same calls as get_monthly_history, in
+        the same order, without building the lists.
+        """
+        return self.callhistory.iter_monthly_history(month, year)
+
     def get_bill(self, month: int, year: int) \
             -> Optional[Dict[str, Union[float, int]]]:
         """ Return a bill summary for the <month>+<year> billing cycle, as a
@@ -146,7 +162,7 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'allowed-import-modules': [
             'python_ta', 'typing',
-            'call', 'callhistory', 'bill', 'contract'
+            'call', 'callhistory', 'callstore', 'bill', 'contract'
         ],
         'generated-members': 'pygame.*'
     })
@@ -0,0 +1,174 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+from call import Call
+from phoneline import PhoneLine
+from callhistory import CallView
+
+if TYPE_CHECKING:
+    from customer import Customer
+
+
+class LineRegistry:
+    """ An index from phone numbers to the Customer and PhoneLine that own
+    them, so that routing an event to its line does not need to scan every
+    customer.
+
+    Customers attached to a registry keep it up to date themselves, whenever
+    a phone line is added to or cancelled from them.
+
+    The registry also keeps a CallView of the outgoing calls of all its
+    phone lines, which the attached customers update as calls are made.
+    """
+    # === Private Attributes ===
+    # _lines:
+    #     maps each registered phone number to a (Customer, PhoneLine) tuple
+    # _customers:
+    #     the customers attached to this registry, in the order they were
+    #     attached
+    # _view:
+    #     the outgoing calls of the registered phone lines
+    # _covered:
+    #     the last list of customers found to cover this registry, or None
+    _lines: Dict[str, Tuple['Customer', PhoneLine]]
+    _customers: List['Customer']
+    _view: CallView
+    _covered: Optional[List['Customer']]
+
+    def __init__(self) -> None:
+        """ Create an empty LineRegistry.
+        """
+        self._lines = {}
+        self._customers = []
+        self._view = CallView()
+        self._covered = None
+
+    def attach(self, customer: 'Customer') -> None:
+        """ Register every phone line currently owned by <customer>.
+        """
+        self._customers.append(customer)
+        for line in customer.get_phone_lines():
+            self.register(customer, line)
+
+    def get_num_customers(self) -> int:
+        """ Return the number of customers attached to this registry
+        """
+        return len(self._customers)
+
+    def covers(self, customer_list: List['Customer']) -> bool:
+        """ Return whether the customers attached to this registry are
+        exactly the customers in <customer_list>.
+
+        The last list found to cover this registry is remembered, so that
+        checking the same list object again only compares its length with the
+        number of attached customers. Replacing a customer of that list by
+        another one is not detected.
+        """
+        if len(customer_list) != len(self._customers):
+            return False
+        if customer_list is self._covered:
+            return True
+        if all(cust.get_registry() is self for cust in customer_list):
+            self._covered = customer_list
+            return True
+        return False
+
+    def register(self, customer: 'Customer', line: PhoneLine) -> None:
+        """ Record that the phone line <line> is owned by <customer>.
+        If the number was owned by another customer, it now belongs to
+        <customer>.
+        """
+        number = line.get_number()
+        if number in self._lines:
+            self._view.remove_history(self._lines[number][1].callhistory)
+        self._lines[number] = (customer, line)
+        self._view.add_history(line.callhistory, False)
+
+    def unregister(self, customer: 'Customer', number: str) -> None:
+        """ Forget the phone number <number>, if it is currently owned by
+        <customer>.
+        """
+        entry = self._lines.get(number)
+        if entry is not None and entry[0] is customer:
+            del self._lines[number]
+            self._view.remove_history(entry[1].callhistory)
+
+    def get_view(self) -> CallView:
+        """ Return the CallView of the outgoing calls of every registered
+        phone line.
+        """
+        return self._view
+
+    def get_all_calls(self) -> List[Call]:
+        """ Return the outgoing calls of every registered phone line, as a
+        list which is kept up to date as calls are made. The list must not be
+        modified.
+        """
+        return self._view.get_calls()
+
+    def find(self, number: str) -> Optional[Tuple['Customer', PhoneLine]]:
+        """ Return the (Customer, PhoneLine) owning the phone number <number>,
+        or None if the number does not belong to any customer.
+        """
+        return self._lines.get(number)
+
+    def find_customer(self, number: str) -> Optional['Customer']:
+        """ Return the Customer owning the phone number <number>, or None if
+        the number does not belong to any customer.
+        """
+        entry = self._lines.get(number)
+        if entry is None:
+            return None
+        return entry[0]
+
+    def __contains__(self, number: str) -> bool:
+        """ Check if the phone number <number> belongs to any customer
+        """
+        return number in self._lines
+
+    def __len__(self) -> int:
+        """ Return the number of registered phone numbers
+        """
+        return len(self._lines)
+
+
+def get_registry(customer_list: List['Customer']) -> LineRegistry:
+    """ Return a LineRegistry covering every phone line in <customer_list>.
+
+    If all customers, and only those, are attached to the same registry (as
+    they are when built by create_customers), that registry is returned.
+    Otherwise, a new registry is built from the current lines of the
+    customers.
+    """
+    if customer_list:
+        shared = customer_list[0].get_registry()
+        if shared is not None and shared.covers(customer_list):
+            return shared
+
+    registry = LineRegistry()
+    for cust in customer_list:
+        for line in cust.get_phone_lines():
+            registry.register(cust, line)
+    return registry
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'call', 'phoneline', 'callhistory',
+            'customer'
+        ],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,244 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import multiprocessing
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+from call import Call
+from callstore import CallStore
+from customer import Customer
+from phoneline import PhoneLine
+from contract import Contract
+from registry import get_registry
+from eventstream import parse_time
+from application import process_events
+
+"""
+=== Module Description ===
+
+This file contains a sharded version of application.process_events, which
+processes the events in a pool of processes.
+
+The phone lines are split into shards. The events are routed to the shards
+of their source and destination numbers, and every shard also receives the
+start of each month, so that each worker advances its lines through the same
+months, at the same points, as the sequential run does. The workers build the
+calls and bill them; the bills and contracts of their lines are then copied
+back, and the calls are added to the CallStore of the call histories.
+
+The lines of a shard only depend on the events of their own numbers and on
+the sequence of months, so the result is the same as the sequential run,
+including the balances that prepaid contracts carry over from one month to
+the next. Each call is stored once, by the shard of its source number (or of
+its destination number, if the source number belongs to no customer), and is
+shared by the call histories of both numbers as in the sequential run.
+"""
+
+# Kinds of routed events
+MONTH = 0
+CALL = 1
+
+# The routed events, for each shard, as (MONTH, month, year) and
+# (CALL, call id, event, outgoing, incoming, stored) tuples
+Routing = List[List[Tuple]]
+
+# The result of one shard: the stored calls, the call ids of its rows, and
+# for each of its lines the number, bills, contract, and the call ids of the
+# outgoing and incoming calls by month
+ShardResult = Tuple[CallStore, array,
+                    List[Tuple[str, Dict, Contract, Dict, Dict]]]
+
+# The routing shared with the forked worker processes, as
+# (routed events, lines of each shard)
+_shared_routing: Optional[Tuple[Routing, List[List[PhoneLine]]]] = None
+
+
+def split_lines(customer_list: List[Customer], shards: int) \
+        -> Tuple[List[List[PhoneLine]], Dict[str, int]]:
+    """ Split the phone lines of the customers in <customer_list> into
+    <shards> shards of about the same size. Return the lines of each shard,
+    and the shard of each phone number that events are routed to.
+    """
+    lines = [line for cust in customer_list for line in cust.get_phone_lines()]
+    shard_lines = [lines[i::shards] for i in range(shards)]
+    shard_of_line = {}
+    for shard, shard_list in enumerate(shard_lines):
+        for line in shard_list:
+            shard_of_line[id(line)] = shard
+    registry = get_registry(customer_list)
+    shard_of = {}
+    for line in lines:
+        entry = registry.find(line.get_number())
+        if entry is not None:
+            shard_of[line.get_number()] = shard_of_line[id(entry[1])]
+    return shard_lines, shard_of
+
+
+def route_events(events: Iterable[Dict], shard_of: Dict[str, int],
+                 shards: int) -> Tuple[Routing, int]:
+    """ Return the events of <events> routed to <shards> shards, with
+    <shard_of> giving the shard of each phone number, and the number of
+    calls. Calls are numbered in the order of <events>.
+    """
+    routing = [[] for _ in range(shards)]
+    billing_month = None
+    call_id = 0
+    for event_data in events:
+        event_time = event_data['time']
+        if event_time[5:7] != billing_month:
+            event_date = parse_time(event_time)
+            billing_month = event_time[5:7]
+            marker = (MONTH, event_date.month, event_date.year)
+            for shard_events in routing:
+                shard_events.append(marker)
+        if event_data['type'] == 'call':
+            src = shard_of.get(event_data['src_number'])
+            dst = shard_of.get(event_data['dst_number'])
+            if src is not None:
+                routing[src].append((CALL, call_id, event_data, True,
+                                     dst == src, True))
+            if dst is not None and dst != src:
+                routing[dst].append((CALL, call_id, event_data, False, True,
+                                     src is None))
+            call_id += 1
+    return routing, call_id
+
+
+def process_shard(events: List[Tuple], lines: List[PhoneLine]) \
+        -> ShardResult:
+    """ Process the routed <events> of a shard for its phone lines <lines>,
+    and return the result of the shard.
+
+    The calls are billed, but are not registered in the call histories of
+    the lines: the call ids of the calls of each line are returned instead.
+    """
+    by_number = {line.get_number(): line for line in lines}
+    outgoing = {line.get_number(): {} for line in lines}
+    incoming = {line.get_number(): {} for line in lines}
+    store = CallStore()
+    call_ids = array('q')
+    for event in events:
+        if event[0] == MONTH:
+            for line in lines:
+                line.new_month(event[1], event[2])
+            continue
+        _, call_id, event_data, is_outgoing, is_incoming, stored = event
+        call = Call(event_data['src_number'], event_data['dst_number'],
+                    parse_time(event_data['time']), event_data['duration'],
+                    tuple(event_data['src_loc']),
+                    tuple(event_data['dst_loc']))
+        time = call.get_bill_date()
+        if is_outgoing:
+            line = by_number[call.src_number]
+            line.ensure_bill(call.time.month, call.time.year)
+            line.contract.bill_call(call)
+            outgoing[call.src_number].setdefault(
+                time, array('q')).append(call_id)
+        if is_incoming:
+            line = by_number[call.dst_number]
+            line.ensure_bill(call.time.month, call.time.year)
+            incoming[call.dst_number].setdefault(
+                time, array('q')).append(call_id)
+        if stored:
+            store.add(call)
+            call_ids.append(call_id)
+    return store, call_ids, [(line.get_number(), line.bills, line.contract,
+                              outgoing[line.get_number()],
+                              incoming[line.get_number()])
+                             for line in lines]
+
+
+def _process_shard(shard: int) -> ShardResult:
+    """ Process the shared routed events of the shard <shard>.
+    This runs in a worker process.
+    """
+    routing, shard_lines = _shared_routing
+    return process_shard(routing[shard], shard_lines[shard])
+
+
+def merge_shards(shard_lines: List[List[PhoneLine]],
+                 results: List[ShardResult], num_calls: int) -> None:
+    """ Copy the bills and contracts in <results> back into the phone lines
+    of <shard_lines>, and register the calls of each shard into their call
+    histories. <num_calls> is the number of routed calls.
+    """
+    store = shard_lines[0][0].get_call_history().get_store()
+    call_rows = array('q', bytes(8 * num_calls))
+    for shard_store, call_ids, _ in results:
+        first = store.extend(shard_store)
+        for i, call_id in enumerate(call_ids):
+            call_rows[call_id] = first + i
+
+    for lines, (_, _, line_results) in zip(shard_lines, results):
+        for line, (_, bills, contract, outgoing, incoming) in \
+                zip(lines, line_results):
+            line.bills = bills
+            line.contract = contract
+            line.get_call_history().extend_rows(
+                {time: array('q', map(call_rows.__getitem__, ids))
+                 for time, ids in outgoing.items()},
+                {time: array('q', map(call_rows.__getitem__, ids))
+                 for time, ids in incoming.items()})
+
+
+def process_events_sharded(events: Iterable[Dict],
+                           customer_list: List[Customer],
+                           shards: int) -> None:
+    """ Process the calls from <events> like application.process_events, with
+    the phone lines split into <shards> shards processed in a pool of
+    <shards> processes.
+
+    There are never more shards than phone lines. If there is only one
+    shard, the platform cannot fork processes, or the call histories do not
+    all use the same CallStore, the events are processed sequentially
+    instead.
+
+    All the events are routed before the workers are started, so the routed
+    events of every shard are held in memory at once: this takes memory in
+    O(number of events), even when <events> is streamed from a file (see
+    application.stream_event_history, which does not).
+    """
+    num_lines = sum(len(cust.get_phone_lines()) for cust in customer_list)
+    shards = min(shards, num_lines)
+    shard_lines, shard_of = split_lines(customer_list, max(1, shards))
+    stores = {id(line.get_call_history().get_store())
+              for lines in shard_lines for line in lines}
+    if shards <= 1 or len(stores) != 1 or \
+            'fork' not in multiprocessing.get_all_start_methods():
+        process_events(events, customer_list)
+        return
+
+    global _shared_routing
+    routing, num_calls = route_events(events, shard_of, shards)
+    _shared_routing = (routing, shard_lines)
+    try:
+        context = multiprocessing.get_context('fork')
+        with context.Pool(processes=shards) as pool:
+            results = pool.map(_process_shard, range(shards))
+    finally:
+        _shared_routing = None
+    merge_shards(shard_lines, results, num_calls)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'multiprocessing', 'array', 'call',
+            'callstore', 'customer', 'phoneline', 'contract', 'registry',
+            'eventstream',
+            'application'
+        ],
+        'disable': ['W0603', 'R0914'],
+        'generated-members': 'pygame.*'
+    })
@@ -0,0 +1,207 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+import os
+import pickle
+import struct
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from callstore import CallStore
+from customer import Customer
+
+"""
+=== Module Description ===
+
+This file contains the snapshots of the customers after their events were
+processed: their phone lines, contracts, bills and call histories, including
+the calls themselves. Loading a snapshot replaces reading the dataset and
+replaying all of its events.
+
+A snapshot file starts with a magic string and the SNAPSHOT_VERSION it was
+written with, followed by three pickles:
+- a header, with the size and modification time of the dataset the snapshot
+  was made from, if any, and the state saved with the customers
+- the CallStores of the call histories, whose columns are written as raw
+  array bytes
+- the customers, referring to the CallStores by position
+
+Snapshots written with another SNAPSHOT_VERSION, or made from a dataset that
+has changed since, are rejected. The version must be increased whenever the
+attributes of the stored classes or the format of the header change.
+
+Snapshots are unpickled: only load snapshot files from a trusted source.
+"""
+
+# The first bytes of a snapshot file
+MAGIC = b'MWTSNAP\n'
+
+# The version of the snapshot format and of the stored classes
+SNAPSHOT_VERSION = 4
+
+# The size and modification time of a dataset file
+SourceStamp = Tuple[int, int]
+
+
+def source_stamp(filename: str) -> SourceStamp:
+    """ Return the size and modification time of the file <filename>.
+    """
+    info = os.stat(filename)
+    return info.st_size, info.st_mtime_ns
+
+
+def _stores_of(customers: List[Customer]) -> List[CallStore]:
+    """ Return the CallStores of the call histories of <customers>, in the
+    order they are first found.
+    """
+    stores = {}
+    for cust in customers:
+        for history in cust.get_call_history():
+            store = history.get_store()
+            stores.setdefault(id(store), store)
+    return list(stores.values())
+
+
+class _CustomerPickler(pickle.Pickler):
+    """ A pickler which writes references to the CallStores of a snapshot,
+    instead of the CallStores themselves.
+    """
+    # === Private Attributes ===
+    # _store_ids:
+    #     the position of each CallStore in the snapshot, by id
+    _store_ids: Dict[int, int]
+
+    def __init__(self, file: Any, stores: List[CallStore]) -> None:
+        """ Create a pickler writing to <file>, for a snapshot with <stores>.
+        """
+        pickle.Pickler.__init__(self, file, pickle.HIGHEST_PROTOCOL)
+        self._store_ids = {id(store): i for i, store in enumerate(stores)}
+
+    def persistent_id(self, obj: Any) -> Optional[int]:
+        """ Return the position of <obj> in the snapshot if it is one of its
+        CallStores, or None to pickle it normally.
+        """
+        if isinstance(obj, CallStore):
+            return self._store_ids[id(obj)]
+        return None
+
+
+class _CustomerUnpickler(pickle.Unpickler):
+    """ An unpickler which resolves the references to the CallStores of a
+    snapshot.
+    """
+    # === Private Attributes ===
+    # _stores:
+    #     the CallStores of the snapshot, by position
+    _stores: List[CallStore]
+
+    def __init__(self, file: Any, stores: List[CallStore]) -> None:
+        """ Create an unpickler reading from <file>, for a snapshot with
+        <stores>.
+        """
+        pickle.Unpickler.__init__(self, file)
+        self._stores = stores
+
+    def persistent_load(self, pid: Any) -> CallStore:
+        """ Return the CallStore at position <pid> in the snapshot.
+        """
+        return self._stores[pid]
+
+
+def save_snapshot(filename: str, customers: List[Customer],
+                  source: Optional[str] = None,
+                  state: Optional[Dict[str, Any]] = None) -> None:
+    """ Write a snapshot of <customers> to the file <filename>. <source> is
+    the dataset file the customers were built from, if any. <state> is saved
+    with the customers, e.g. how far the events were processed.
+
+    The snapshot is written to a temporary file first, so that <filename> is
+    never left half written.
+    """
+    stores = _stores_of(customers)
+    header = {'source': source_stamp(source) if source else None,
+              'customers': len(customers),
+              'state': state if state is not None else {}}
+    temp_name = filename + '.tmp'
+    with open(temp_name, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', SNAPSHOT_VERSION))
+        pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(stores, f, pickle.HIGHEST_PROTOCOL)
+        _CustomerPickler(f, stores).dump(customers)
+    os.replace(temp_name, filename)
+
+
+def load_snapshot(filename: str, source: Optional[str] = None) \
+        -> List[Customer]:
+    """ Return the customers of the snapshot in the file <filename>, as
+    read_snapshot.
+    """
+    return read_snapshot(filename, source)[0]
+
+
+def read_snapshot(filename: str, source: Optional[str] = None) \
+        -> Tuple[List[Customer], Dict[str, Any]]:
+    """ Return the customers of the snapshot in the file <filename>, and the
+    state saved with them.
+
+    If the snapshot was written with another SNAPSHOT_VERSION, or <source> is
+    given and is not the same dataset file, unchanged, as the one the
+    snapshot was made from, raise a ValueError. A truncated or corrupt
+    snapshot file also raises a ValueError.
+    """
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a snapshot file: " + filename)
+        version = f.read(4)
+        if len(version) < 4:
+            raise ValueError("Corrupt snapshot: {} (truncated)".format(
+                filename))
+        version = struct.unpack('<I', version)[0]
+        if version != SNAPSHOT_VERSION:
+            raise ValueError("Stale snapshot: version {}, expected {}".format(
+                version, SNAPSHOT_VERSION))
+        header = _load(f, filename, pickle.load)
+        if source is not None and header['source'] != source_stamp(source):
+            raise ValueError("Stale snapshot: {} has changed".format(source))
+        stores = _load(f, filename, pickle.load)
+        customers = _load(f, filename,
+                          lambda file: _CustomerUnpickler(file, stores).load())
+    return customers, header['state']
+
+
+# The errors raised when unpickling a truncated or corrupt snapshot file
+_CORRUPT_ERRORS = (pickle.UnpicklingError, EOFError, ValueError)
+
+
+def _load(file: Any, filename: str, load: Callable[[Any], Any]) -> Any:
+    """ Return the next object of the snapshot in the open <file>, read by
+    calling <load> on <file>. If the snapshot in <filename> is truncated or
+    corrupt, raise a ValueError.
+    """
+    try:
+        return load(file)
+    except _CORRUPT_ERRORS as error:
+        raise ValueError("Corrupt snapshot: {} ({})".format(
+            filename, error)) from error
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'os', 'pickle', 'struct', 'callstore',
+            'customer'
+        ],
+        'allowed-io': [
+            'save_snapshot', 'read_snapshot'
+        ],
+        'generated-members': 'pygame.*'
+    })
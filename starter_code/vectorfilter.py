@@ -0,0 +1,272 @@
+"""
+CSC148, Winter 2019
+Assignment 1
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
+"""
+from typing import List, Optional, Tuple
+import numpy as np
+from call import Call
+from customer import Customer
+from callstore import CallStore, get_store, take_column
+from callindex import CallList, get_index
+from filter import Filter, CustomerFilter, DurationFilter, LocationFilter, \
+    parse_customer_id, parse_duration, parse_location
+
+"""
+=== Module Description ===
+
+This file contains a vectorized engine for the customer, duration and location
+filters. The calls of a list are turned once into NumPy columns (see
+CallColumns), and each filter string is then evaluated as a boolean mask over
+all the calls at once. A chain of filters combines the masks of its filters,
+and only the calls selected by the final mask are returned.
+
+The results are the same calls, in the same order, as applying the filters
+one after the other with Filter.apply. NumPy is only needed by this module.
+"""
+
+
+class CallColumns:
+    """ The calls of a list as NumPy columns, with one entry per call in the
+    order of the list.
+
+    When all the calls are in the CallStore given, the columns are gathered
+    from the store; otherwise they are read from the calls themselves.
+
+    === Public Attributes ===
+    data:
+         the calls
+    store:
+         the CallStore holding all the calls, or None
+    rows:
+         the row of each call in <store>, or None if <store> is None
+    durations:
+         the duration of each call
+    src_longs, src_lats:
+         the longitude and latitude of the source of each call
+    dst_longs, dst_lats:
+         the longitude and latitude of the destination of each call
+    """
+    data: List[Call]
+    store: Optional[CallStore]
+    rows: Optional[np.ndarray]
+    durations: np.ndarray
+    src_longs: np.ndarray
+    src_lats: np.ndarray
+    dst_longs: np.ndarray
+    dst_lats: np.ndarray
+
+    def __init__(self, data: List[Call],
+                 store: Optional[CallStore] = None) -> None:
+        """ Build the columns of the calls in <data>, from <store> if it is
+        given and holds all of them.
+        """
+        self.data = data
+        n = len(data)
+        rows = None
+        if store is not None:
+            rows = [store.get_row(call) for call in data]
+            if None in rows:
+                store, rows = None, None
+            else:
+                rows = np.array(rows, dtype=np.int64)
+        self.store = store
+        self.rows = rows
+
+        if store is not None:
+            self.durations = take_column(store.durations, rows)
+            self.src_longs = take_column(store.src_longs, rows)
+            self.src_lats = take_column(store.src_lats, rows)
+            self.dst_longs = take_column(store.dst_longs, rows)
+            self.dst_lats = take_column(store.dst_lats, rows)
+        else:
+            self.durations = np.fromiter((call.duration for call in data),
+                                         dtype=np.int64, count=n)
+            self.src_longs = np.fromiter((call.src_loc[0] for call in data),
+                                         dtype=np.float64, count=n)
+            self.src_lats = np.fromiter((call.src_loc[1] for call in data),
+                                        dtype=np.float64, count=n)
+            self.dst_longs = np.fromiter((call.dst_loc[0] for call in data),
+                                         dtype=np.float64, count=n)
+            self.dst_lats = np.fromiter((call.dst_loc[1] for call in data),
+                                        dtype=np.float64, count=n)
+
+    def __len__(self) -> int:
+        """ Return the number of calls
+        """
+        return len(self.data)
+
+    def select(self, mask: np.ndarray) -> List[Call]:
+        """ Return the calls selected by the boolean <mask>, in order.
+        """
+        data = self.data
+        return [data[i] for i in np.flatnonzero(mask).tolist()]
+
+
+def _customer_mask(columns: CallColumns, customers: List[Customer],
+                   filtering_id: int) -> Optional[np.ndarray]:
+    """ Return the mask of the calls made or received by the customer with
+    the id <filtering_id>, or None if there is no such customer.
+
+    Only the first occurrence of each call is selected, like CustomerFilter.
+    """
+    matching = [cust for cust in customers if cust.get_id() == filtering_id]
+    if not matching:
+        return None
+    histories = [history for cust in matching
+                 for history in cust.get_call_history()]
+    store = columns.store
+    if store is not None and \
+            all(history.get_store() is store for history in histories):
+        # Mark the rows of the customer's calls, and look up every call's row
+        member = np.zeros(len(store), dtype=bool)
+        for history in histories:
+            outgoing, incoming = history.get_monthly_rows()
+            member[outgoing] = True
+            member[incoming] = True
+        mask = member[columns.rows]
+        keys = columns.rows
+    else:
+        customer_calls = set()
+        for cust in matching:
+            outgoing, incoming = cust.iter_history()
+            customer_calls.update(outgoing)
+            customer_calls.update(incoming)
+        mask = np.fromiter((call in customer_calls for call in columns.data),
+                           dtype=bool, count=len(columns))
+        keys = None
+
+    positions = np.flatnonzero(mask)
+    if keys is None:
+        selected = np.fromiter((id(columns.data[i]) for i in positions),
+                               dtype=np.uint64, count=len(positions))
+    else:
+        selected = keys[positions]
+    first = np.unique(selected, return_index=True)[1]
+    if len(first) < len(positions):
+        mask = np.zeros(len(columns), dtype=bool)
+        mask[positions[first]] = True
+    return mask
+
+
+def _duration_mask(columns: CallColumns, filter_string: str,
+                   duration: int) -> Optional[np.ndarray]:
+    """ Return the mask of the calls lasting less ("L") or more ("G") than
+    <duration> seconds, or None if <duration> is negative.
+    """
+    if duration < 0:
+        return None
+    if filter_string[0] == "G":
+        return columns.durations > duration
+    return columns.durations < duration
+
+
+def _location_mask(columns: CallColumns,
+                   coordinate_list: List[float]) -> np.ndarray:
+    """ Return the mask of the calls with a source or destination inside the
+    rectangle <coordinate_list> (boundaries included).
+    """
+    lower_long, lower_lat, upper_long, upper_lat = coordinate_list
+    src_inside = (lower_long <= columns.src_longs) & \
+        (columns.src_longs <= upper_long) & \
+        (lower_lat <= columns.src_lats) & (columns.src_lats <= upper_lat)
+    dst_inside = (lower_long <= columns.dst_longs) & \
+        (columns.dst_longs <= upper_long) & \
+        (lower_lat <= columns.dst_lats) & (columns.dst_lats <= upper_lat)
+    return src_inside | dst_inside
+
+
+def supports(f: Filter) -> bool:
+    """ Return whether the filter <f> can be evaluated as a mask.
+    """
+    return isinstance(f, (CustomerFilter, DurationFilter, LocationFilter))
+
+
+def filter_mask(f: Filter, customers: List[Customer], columns: CallColumns,
+                filter_string: str) -> Optional[np.ndarray]:
+    """ Return the mask of the calls of <columns> selected by applying the
+    filter <f> with <customers> and <filter_string>, or None if the filter
+    has no effect.
+
+    Precondition: supports(f)
+    """
+    if isinstance(f, CustomerFilter):
+        filtering_id = parse_customer_id(filter_string)
+        if filtering_id is None:
+            return None
+        return _customer_mask(columns, customers, filtering_id)
+    if isinstance(f, DurationFilter):
+        duration = parse_duration(filter_string)
+        if duration is None:
+            return None
+        return _duration_mask(columns, filter_string, duration)
+    if isinstance(f, LocationFilter):
+        coordinate_list = parse_location(filter_string)
+        if coordinate_list is None:
+            return None
+        return _location_mask(columns, coordinate_list)
+    raise TypeError("Filter cannot be vectorized: " + type(f).__name__)
+
+
+def get_columns(data: List[Call],
+                store: Optional[CallStore] = None) -> CallColumns:
+    """ Return the CallColumns of <data>, gathered from <store> if it holds
+    all the calls. The columns of a CallList are cached like the filter
+    indexes (see callindex.get_index).
+    """
+    if isinstance(data, CallList):
+        return get_index('columns', data,
+                         lambda calls: CallColumns(calls, store))
+    return CallColumns(data, store)
+
+
+def apply_filters(customers: List[Customer], data: List[Call],
+                  filters: List[Tuple[Filter, str]]) -> List[Call]:
+    """ Return the calls from <data> selected by applying each (filter,
+    filter string) pair of <filters> in turn, with <customers>, as a single
+    combined mask. If no filter has an effect, <data> itself is returned.
+
+    Precondition: supports(f) for every filter f in <filters>
+    """
+    columns = get_columns(data, get_store(customers))
+    combined = None
+    for f, filter_string in filters:
+        mask = filter_mask(f, customers, columns, filter_string)
+        if mask is None:
+            continue
+        if combined is None:
+            combined = mask
+        else:
+            combined &= mask
+    if combined is None:
+        return data
+    return columns.select(combined)
+
+
+def apply_filter(f: Filter, customers: List[Customer], data: List[Call],
+                 filter_string: str) -> List[Call]:
+    """ Return the same calls as f.apply(customers, data, filter_string),
+    computed with a mask.
+
+    Precondition: supports(f)
+    """
+    return apply_filters(customers, data, [(f, filter_string)])
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': [
+            'python_ta', 'typing', 'numpy', 'call', 'customer', 'callstore',
+            'callindex', 'filter'
+        ],
+        'generated-members': 'pygame.*'
+    })
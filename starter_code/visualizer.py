@@ -12,8 +12,6 @@ All of the files in this directory and all subdirectories are:
 Copyright (c) 2019 Bogdan Simion, Diane Horton, Jacqueline Smith
 """
 import os
-import threading
-import math
 import time
 from typing import List, Tuple, Any, Optional, Union, Callable
 from tkinter import *
@@ -21,6 +19,7 @@ import pygame
 from call import Drawable, Call
 from customer import Customer
 from filter import DurationFilter, CustomerFilter, LocationFilter, ResetFilter
+from executor import FilterExecutor
 
 """
 === Module Description ===
@@ -58,6 +57,7 @@ class Visualizer:
 
     === Public attributes ===
     r: the Tk object for the main window
+    executor: the FilterExecutor used to apply filters
     """
     # === Private attributes ===
     # _screen: the pygame window that is shown to the user.
@@ -71,10 +71,15 @@ class Visualizer:
     _map: 'Map'
     _quit: bool
     r: Tk
+    executor: FilterExecutor
 
-    def __init__(self) -> None:
-        """Initialize this visualization.
+    def __init__(self, executor: Optional[FilterExecutor] = None) -> None:
+        """Initialize this visualization. Filters are applied with
+        <executor>, or serially if it is None.
         """
+        if executor is None:
+            executor = FilterExecutor()
+        self.executor = executor
         self.r = Tk()
         Label(self.r, text="Welcome to MewbileTech phone management system")\
             .grid(row=0, column=0)
@@ -143,7 +148,6 @@ class Visualizer:
                 self._quit = True
             elif event.type == pygame.KEYDOWN:
                 f = None
-                num_threads = 1
 
                 if event.unicode == "d":
                     f = DurationFilter()
@@ -153,61 +157,22 @@ class Visualizer:
                     f = CustomerFilter()
                 elif event.unicode == "r":
                     f = ResetFilter()
-                    num_threads = 1
 
                 if f is not None:
-                    def result_wrapper(fun: Callable[[List[Customer],
-                                                      List[Call],
-                                                      str], List[Call]],
-                                       customers: List[Customer],
-                                       data: List[Call],
-                                       filter_string: str,
-                                       res: List) -> None:
-                        """A final wrapper to return the result of the operation
-                        """
-                        res.append(fun(customers, data, filter_string))
-
-                    def threading_wrapper(customers: List[Customer],
-                                          data: List[Call],
-                                          filter_string: str) -> List[Call]:
+                    def executor_wrapper(customers: List[Customer],
+                                         data: List[Call],
+                                         filter_string: str) -> List[Call]:
                         """A wrapper for the application of filters with
-                        threading
+                        the executor of this visualizer
                         """
-                        chunk_sz_calls = math.ceil(
-                            (len(data) + num_threads - 1) / num_threads)
-                        print("Num_threads:", num_threads)
-                        print("Chunk_calls:", chunk_sz_calls)
-                        threads = []
-                        results = []
-                        for i in range(num_threads):
-                            res = []
-                            results.append(res)
-                            t = threading.Thread(target=result_wrapper,
-                                                 args=
-                                                 (f.apply,
-                                                  customers,
-                                                  data[i*chunk_sz_calls:
-                                                       (i+1)*chunk_sz_calls],
-                                                  filter_string,
-                                                  res))
-                            t.daemon = True
-                            t.start()
-                            threads.append(t)
-                            # f.apply(customers, data, filter_string)
-                        # Wait to finish
-                        for t in threads:
-                            t.join()
-
-                        # Now reconstruct the data
-                        new_data = []
-                        for res in results:
-                            new_data.extend(res[0])
-                        return new_data
+                        print("Executor:", self.executor)
+                        return self.executor.apply(f, customers, data,
+                                                   filter_string)
 
                     new_drawables = self.entry_window(str(f),
                                                       customers,
                                                       drawables,
-                                                      threading_wrapper)
+                                                      executor_wrapper)
 
                 # Perform the billing for a selected customer:
                 if event.unicode == "m":
@@ -446,12 +411,11 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'allowed-import-modules': [
             'doctest', 'python_ta', 'typing',
-            'tkinter', 'os', 'pygame',
-            'threading', 'math', 'time',
-            'customer', 'call', 'filter',
+            'tkinter', 'os', 'pygame', 'time',
+            'customer', 'call', 'filter', 'executor',
         ],
         'allowed-io': [
-            'entry_window', 'callback_wrapper', 'threading_wrapper',
+            'entry_window', 'callback_wrapper', 'executor_wrapper',
             '__init__', 'handle_window_events'
         ],
         'disable': ['R0915', 'W0613', 'W0401', 'R0201'],